@@ -0,0 +1,77 @@
+"""
+Compare the size and the parsing time of a GBFS vehicle snapshot stored as GeoJSON, as the collectors do by default,
+with the Arrow IPC and Parquet content types of `digitaltwin_dataspace.data.columnar`.
+
+Parsing is measured the way a harvester reads a snapshot: `json.loads` and `geopandas.read_file` for GeoJSON, and
+`Data.as_table()` / `Data.as_dataframe()` for the columnar formats.
+
+Usage: python -m benchmarks.columnar_snapshot [--payload free_bike_status.json] [--vehicles 10000] [--repeat 5]
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+# Measure the parsing, not the blob cache
+os.environ.setdefault("BLOB_CACHE_MAX_BYTES", "0")
+
+from benchmarks.gbfs_geojson import generate_payload, bench  # noqa: E402
+from digitaltwin_dataspace.data.columnar import (  # noqa: E402
+    ARROW_CONTENT_TYPE,
+    PARQUET_CONTENT_TYPE,
+    points_to_table,
+    serialize,
+)
+from digitaltwin_dataspace.data.retrieve import Data  # noqa: E402
+from digitaltwin_dataspace.data.storage import storage_manager  # noqa: E402
+from digitaltwin_dataspace.geojson import points_to_geojson  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="Recorded free_bike_status.json payload")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as file:
+            payload = json.load(file)
+    else:
+        payload = generate_payload(args.vehicles)
+    vehicles = payload["data"]["bikes"]
+
+    geojson = points_to_geojson(vehicles)
+    table = points_to_table(vehicles)
+    blobs = {
+        "arrow ipc (zstd)": (ARROW_CONTENT_TYPE, serialize(table, ARROW_CONTENT_TYPE)),
+        "arrow ipc (none)": (ARROW_CONTENT_TYPE, serialize(table, ARROW_CONTENT_TYPE, compression=None)),
+        "parquet (zstd)": (PARQUET_CONTENT_TYPE, serialize(table, PARQUET_CONTENT_TYPE)),
+    }
+
+    print(f"{len(vehicles)} vehicles")
+    print(f"{'format':<20} {'size':>10} {'ratio':>7} {'table':>10} {'dataframe':>10}")
+
+    import geopandas
+
+    json_time = bench(json.loads, geojson, args.repeat)
+    frame_time = bench(lambda blob: geopandas.read_file(io.BytesIO(blob)), geojson, args.repeat)
+    print(f"{'geojson':<20} {len(geojson):>10} {1:>7.1f} {json_time * 1000:>8.1f}ms {frame_time * 1000:>8.1f}ms")
+
+    for name, (content_type, blob) in blobs.items():
+        url = storage_manager.write(f"benchmark/{name.replace(' ', '_')}", blob)
+        data = Data(date=None, hash=None, _url=url, content_type=content_type)
+        table_time = bench(lambda d: d.as_table(), data, args.repeat)
+        frame_time = bench(lambda d: d.as_dataframe(), data, args.repeat)
+        print(
+            f"{name:<20} {len(blob):>10} {len(geojson) / len(blob):>7.1f} "
+            f"{table_time * 1000:>8.1f}ms {frame_time * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the queries per second of a pooled engine with a NullPool engine.
+
+Each query opens and closes its own connection, as the retrieve and write functions do. The benchmark runs against
+DATABASE_URL (e.g. a local Postgres), or against a SQLite file standing in for it when the variable is not set.
+
+Usage: python -m benchmarks.engine_pool [--queries 2000] [--threads 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text, NullPool, QueuePool
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite3")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+
+from digitaltwin_dataspace.data.engine import engine_arguments  # noqa: E402
+
+
+def bench(database_url: str, poolclass, queries: int, threads: int) -> float:
+    args = engine_arguments(database_url)
+    args["poolclass"] = poolclass
+    if poolclass is NullPool:
+        for setting in ("pool_size", "max_overflow", "pool_timeout"):
+            args.pop(setting, None)
+    else:
+        args.setdefault("pool_size", threads)
+
+    engine = create_engine(database_url, **args)
+
+    def query(_):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1")).scalar()
+
+    # Warm up, e.g. fill the pool
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(query, range(threads)))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(query, range(queries)))
+    elapsed = time.monotonic() - start
+
+    engine.dispose()
+    return queries / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    database_url = os.environ["DATABASE_URL"]
+    print(f"Database: {database_url.split('@')[-1]}")
+
+    for label, poolclass in (("NullPool", NullPool), ("QueuePool", QueuePool)):
+        print(f"{label:<12} {bench(database_url, poolclass, args.queries, args.threads):>10.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
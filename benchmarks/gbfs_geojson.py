@@ -0,0 +1,97 @@
+"""
+Compare the conversion of a GBFS free_bike_status payload to GeoJSON through pandas, shapely and geopandas, as the
+micromobility collectors used to do, with `digitaltwin_dataspace.geojson.points_to_geojson`.
+
+Without --payload, a payload of --vehicles vehicles shaped like the Brussels feeds is generated.
+
+Usage: python -m benchmarks.gbfs_geojson [--payload free_bike_status.json] [--vehicles 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+
+from digitaltwin_dataspace.geojson import points_to_geojson, orjson  # noqa: E402
+
+
+def generate_payload(vehicles: int) -> dict:
+    generator = random.Random(42)
+    return {
+        "last_updated": 1700000000,
+        "ttl": 10,
+        "version": "2.2",
+        "data": {
+            "bikes": [
+                {
+                    "bike_id": f"{generator.getrandbits(64):016x}",
+                    "lat": 50.85 + generator.uniform(-0.05, 0.05),
+                    "lon": 4.35 + generator.uniform(-0.05, 0.05),
+                    "is_reserved": False,
+                    "is_disabled": generator.random() < 0.05,
+                    "vehicle_type_id": generator.choice(["scooter", "bike"]),
+                    "current_range_meters": generator.randint(0, 40000),
+                    "rental_uris": {
+                        "android": f"https://example.com/android/{index}",
+                        "ios": f"https://example.com/ios/{index}",
+                    },
+                }
+                for index in range(vehicles)
+            ]
+        },
+    }
+
+
+def legacy(payload: dict) -> bytes:
+    import geopandas as gpd
+    import pandas as pd
+    import shapely
+
+    response_df = pd.json_normalize(payload["data"]["bikes"])
+    response_gdf = gpd.GeoDataFrame(
+        response_df,
+        crs="epsg:4326",
+        geometry=[
+            shapely.geometry.Point(xy)
+            for xy in zip(response_df["lon"], response_df["lat"])
+        ],
+    )
+    response_gdf = response_gdf.drop(columns=["lat", "lon"])
+    return response_gdf.to_json().encode("utf-8")
+
+
+def bench(func, payload: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payload", help="Recorded free_bike_status.json payload")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as file:
+            payload = json.load(file)
+    else:
+        payload = generate_payload(args.vehicles)
+
+    print(f"{len(payload['data']['bikes'])} vehicles, JSON encoder: {'orjson' if orjson else 'json'}")
+    legacy_time = bench(legacy, payload, args.repeat)
+    points_time = bench(lambda p: points_to_geojson(p["data"]["bikes"]), payload, args.repeat)
+    print(f"{'pandas + geopandas':<20} {legacy_time * 1000:>8.1f} ms")
+    print(f"{'points_to_geojson':<20} {points_time * 1000:>8.1f} ms   ({legacy_time / points_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare fetching an hour of 10s snapshots of a collector through 360 calls of its `/` endpoint, as clients had to,
+with a single streamed call of its `/range` endpoint.
+
+The latency of a remote blob storage is simulated by delaying every blob read by --latency milliseconds.
+
+Usage: python -m benchmarks.range_endpoint [--rows 360] [--size 20000] [--latency 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/benchmark.db")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+os.environ.setdefault("BLOB_CACHE_MAX_BYTES", "0")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from digitaltwin_dataspace import Collector, ComponentConfiguration  # noqa: E402
+from digitaltwin_dataspace.data.storage import storage_manager  # noqa: E402
+from digitaltwin_dataspace.data.write import write_result  # noqa: E402
+
+
+class BenchmarkCollector(Collector):
+    def get_schedule(self) -> str:
+        return "10s"
+
+    def get_configuration(self) -> ComponentConfiguration:
+        return ComponentConfiguration(
+            name="benchmark_collector",
+            description="Benchmark collector",
+            content_type="application/json",
+        )
+
+    def collect(self) -> bytes:
+        return b"{}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=360)
+    parser.add_argument("--size", type=int, default=20000, help="Size of the snapshots in bytes")
+    parser.add_argument("--latency", type=float, default=20, help="Latency of a blob read in milliseconds")
+    args = parser.parse_args()
+
+    collector = BenchmarkCollector()
+    table = collector.get_table()
+    start = datetime(2024, 1, 1)
+    for index in range(args.rows):
+        content = f'{{"index": {index}, "padding": "{"x" * args.size}"}}'.encode("utf-8")
+        write_result("benchmark_collector", "application/json", table, content, start + timedelta(seconds=10 * index))
+
+    read, iter_read = storage_manager.read, storage_manager.iter_read
+
+    def slow_read(file_name):
+        time.sleep(args.latency / 1000)
+        return read(file_name)
+
+    def slow_iter_read(file_name, *args_, **kwargs):
+        time.sleep(args.latency / 1000)
+        return iter_read(file_name, *args_, **kwargs)
+
+    storage_manager.read = slow_read
+    storage_manager.iter_read = slow_iter_read
+
+    app = FastAPI()
+    for endpoint, method, path, _ in collector.get_endpoints():
+        app.add_api_route(f"/benchmark-collector{path}", endpoint, methods=[method])
+    client = TestClient(app)
+
+    begin = time.perf_counter()
+    for index in range(args.rows):
+        client.get(
+            "/benchmark-collector/",
+            params={"timestamp": (start + timedelta(seconds=10 * index + 1)).isoformat()},
+        ).raise_for_status()
+    single_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    response = client.get("/benchmark-collector/range", params={"start": start.isoformat(), "limit": args.rows})
+    lines = response.text.splitlines()
+    range_time = time.perf_counter() - begin
+    assert len(lines) == args.rows
+
+    print(f"{args.rows} rows of {args.size} bytes, {args.latency} ms per blob read")
+    print(f"{'/ x ' + str(args.rows):<12} {single_time * 1000:>9.0f} ms")
+    print(f"{'/range':<12} {range_time * 1000:>9.0f} ms   ({single_time / range_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare the throughput and dispatch latency of the long-lived worker pool with the former fork-per-tick design.
+
+The dispatch latency is measured from the moment the scheduler hands a job over to the moment the job starts running.
+
+Usage: python -m benchmarks.worker_pool [--jobs 500] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+
+from digitaltwin_dataspace import Collector, ComponentConfiguration  # noqa: E402
+from digitaltwin_dataspace.workers import WorkerPool  # noqa: E402
+
+
+class NoopCollector(Collector):
+    def __init__(self, execution_mode: str):
+        self.execution_mode = execution_mode
+
+    def get_execution_mode(self):
+        return self.execution_mode
+
+    def get_overlap_policy(self):
+        return "concurrent"
+
+    def get_max_concurrent_runs(self) -> int:
+        return 1_000_000
+
+    def get_schedule(self) -> str:
+        return "1s"
+
+    def get_configuration(self) -> ComponentConfiguration:
+        return ComponentConfiguration(
+            name="noop_collector",
+            description="Does nothing, only reports when it started",
+            content_type="application/octet-stream",
+        )
+
+    def run(self):
+        return time.monotonic()
+
+    def collect(self) -> bytes:
+        return b""
+
+
+def _fork_target(queue):
+    queue.put(time.monotonic())
+
+
+def bench_fork_per_tick(jobs: int):
+    queue = multiprocessing.Queue()
+
+    # Throughput: fork every job at once
+    start = time.monotonic()
+    processes = [multiprocessing.Process(target=_fork_target, args=(queue,)) for _ in range(jobs)]
+    for process in processes:
+        process.start()
+    for _ in range(jobs):
+        queue.get()
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - start
+
+    # Latency: one job at a time, as an isolated tick would
+    latencies = []
+    for _ in range(jobs):
+        process = multiprocessing.Process(target=_fork_target, args=(queue,))
+        submitted = time.monotonic()
+        process.start()
+        latencies.append(queue.get() - submitted)
+        process.join()
+
+    return elapsed, latencies
+
+
+def bench_worker_pool(jobs: int, workers: int, mode: str):
+    pool = WorkerPool([NoopCollector(mode)], process_workers=workers, thread_workers=workers)
+
+    # Warm up the workers, as the scheduler would have after its first ticks
+    for future in [pool.submit("noop_collector") for _ in range(workers)]:
+        future.result()
+
+    # Throughput: submit every job at once
+    start = time.monotonic()
+    for future in [pool.submit("noop_collector") for _ in range(jobs)]:
+        future.result()
+    elapsed = time.monotonic() - start
+
+    # Latency: one job at a time, as an isolated tick would
+    latencies = []
+    for _ in range(jobs):
+        submitted = time.monotonic()
+        latencies.append(pool.submit("noop_collector").result() - submitted)
+
+    pool.shutdown()
+    return elapsed, latencies
+
+
+def report(label: str, jobs: int, elapsed: float, latencies):
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(f"{label:<20} {jobs / elapsed:>10.1f} jobs/s   p99 dispatch latency {p99 * 1000:>8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    report("fork per tick", args.jobs, *bench_fork_per_tick(args.jobs))
+    report("process pool", args.jobs, *bench_worker_pool(args.jobs, args.workers, "process"))
+    report("thread pool", args.jobs, *bench_worker_pool(args.jobs, args.workers, "thread"))
+
+
+if __name__ == "__main__":
+    main()
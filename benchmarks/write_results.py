@@ -0,0 +1,101 @@
+"""
+Compare writing the items of a backfill or of a harvester with multiple results through one `write_result` call each,
+as harvesters did, with a single `write_results` call, and the writes of concurrent collectors committed one by one
+with the group commit writer.
+
+The latency of a remote blob storage is simulated by delaying every blob upload by --latency milliseconds.
+
+Usage: python -m benchmarks.write_results [--rows 500] [--size 2000] [--latency 20] [--threads 8]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/benchmark.db")
+os.environ.setdefault("FILE_STORAGE_DIRECTORY", tempfile.mkdtemp())
+
+from sqlalchemy import func, select  # noqa: E402
+
+from digitaltwin_dataspace.data import write  # noqa: E402
+from digitaltwin_dataspace.data.engine import engine  # noqa: E402
+from digitaltwin_dataspace.data.storage import storage_manager  # noqa: E402
+from digitaltwin_dataspace.data.sync_db import get_or_create_standard_component_table  # noqa: E402
+
+
+def count(table) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--size", type=int, default=2000, help="Size of the items in bytes")
+    parser.add_argument("--latency", type=float, default=20, help="Latency of a blob upload in milliseconds")
+    parser.add_argument("--threads", type=int, default=8, help="Number of concurrent collectors")
+    parser.add_argument("--delay", type=float, default=5, help="Group commit delay in milliseconds")
+    args = parser.parse_args()
+
+    write_blob = storage_manager.write
+
+    def slow_write(file_name, data):
+        time.sleep(args.latency / 1000)
+        return write_blob(file_name, data)
+
+    storage_manager.write = slow_write
+
+    start = datetime(2024, 1, 1)
+
+    def items(offset):
+        return [
+            (f'{{"index": {offset + index}, "padding": "{"x" * args.size}"}}', start + timedelta(seconds=offset + index))
+            for index in range(args.rows)
+        ]
+
+    table = get_or_create_standard_component_table("benchmark_write_loop")
+    begin = time.perf_counter()
+    for data, date in items(0):
+        write.write_result("benchmark_write_loop", "application/json", table, data, date)
+    loop_time = time.perf_counter() - begin
+    assert count(table) == args.rows
+
+    table = get_or_create_standard_component_table("benchmark_write_bulk")
+    begin = time.perf_counter()
+    write.write_results("benchmark_write_bulk", "application/json", table, items(0))
+    bulk_time = time.perf_counter() - begin
+    assert count(table) == args.rows
+
+    def collectors(name, delay):
+        write.GROUP_COMMIT_DELAY = delay
+        table = get_or_create_standard_component_table(name)
+        rows = items(0)
+
+        def collect(thread):
+            for data, date in rows[thread::args.threads]:
+                write.write_result(name, "application/json", table, data, date)
+
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as executor:
+            list(executor.map(collect, range(args.threads)))
+        elapsed = time.perf_counter() - begin
+        assert count(table) == args.rows
+        return elapsed
+
+    # Without remote latency, the commits dominate
+    storage_manager.write = write_blob
+    single_time = collectors("benchmark_write_single", 0)
+    group_time = collectors("benchmark_write_group", args.delay)
+
+    print(f"{args.rows} rows of {args.size} bytes, {args.latency} ms per blob upload")
+    print(f"{'write_result x ' + str(args.rows):<24} {loop_time * 1000:>9.0f} ms")
+    print(f"{'write_results':<24} {bulk_time * 1000:>9.0f} ms   ({loop_time / bulk_time:.1f}x faster)")
+    print(f"{args.threads} collectors writing {args.rows} rows without upload latency")
+    print(f"{'one commit per write':<24} {single_time * 1000:>9.0f} ms")
+    print(f"{'group commit':<24} {group_time * 1000:>9.0f} ms   ({single_time / group_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
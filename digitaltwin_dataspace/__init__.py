@@ -1,5 +1,8 @@
 from .components import (
     Collector,
+    AsyncCollector,
+    NOT_MODIFIED,
+    Compactor,
     Harvester,
     Handler,
     ScheduleRunnable,
@@ -9,4 +12,5 @@ from .components import (
     ComponentConfiguration,
 )
 from .data.retrieve import Data
+from .gbfs import GBFSCollector
 from .runner import run_components
@@ -0,0 +1,88 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+import httpx
+
+# httpx logs every request at the INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Timeout of the HTTP requests in seconds
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 10))
+# Maximum number of connections kept by the shared HTTP client
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+
+
+class _SharedClient:
+    """
+    Event loop running in a background thread of the current process, and the HTTP client bound to it.
+
+    Every asynchronous collector of a process runs its requests on this loop, sharing the connections of the client
+    (keep-alive, and HTTP/2 when the `h2` package is installed). Both are recreated after a fork.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _start(self):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="http-client", daemon=True).start()
+
+        http2 = importlib.util.find_spec("h2") is not None
+
+        async def create_client():
+            return httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                # The client ignores its own limits and http2 when given a transport, they are set on the transport
+                transport=httpx.AsyncHTTPTransport(
+                    http2=http2,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                    ),
+                    # Retry failed connections, the requests themselves are retried by the collectors
+                    retries=2,
+                ),
+                follow_redirects=True,
+            )
+
+        self._client = asyncio.run_coroutine_threadsafe(create_client(), self._loop).result()
+        self._pid = os.getpid()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self._ensure_started()
+        return self._client
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """
+        Run a coroutine on the shared event loop and wait for its result.
+
+        :param coroutine: The coroutine
+        :return: The result of the coroutine
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        """Close the HTTP client and stop the event loop of the current process, if they were started."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._pid = self._loop = self._client = None
+
+
+shared_client = _SharedClient()
@@ -45,6 +45,31 @@ class ScheduleRunnable(abc.ABC):
     def get_schedule(self) -> str:
         pass
 
+    def get_execution_mode(self) -> Literal["process", "thread"]:
+        """
+        Return where the scheduled runs of the component are executed: on the pool of worker processes (default),
+        or on the pool of threads of the scheduler process, which suits I/O-bound components.
+        """
+        return "process"
+
+    def get_overlap_policy(self) -> Literal["skip", "queue", "concurrent"]:
+        """
+        Return what happens when the component is due while a previous run is still going:
+        "skip" drops the tick (default), "queue" runs it once the current run is over (at most one pending run),
+        and "concurrent" allows up to `get_max_concurrent_runs()` runs at the same time.
+        """
+        return "skip"
+
+    def get_max_concurrent_runs(self) -> int:
+        """Return the maximum number of simultaneous runs when the overlap policy is "concurrent"."""
+        return 1
+
+    def get_triggers(self) -> List[str]:
+        """
+        Return the names of the components whose new rows trigger a run of this component, on top of its schedule.
+        """
+        return []
+
 
 def servable_endpoint(path: str, method: Literal["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"] = "GET", response_model: Optional[Any] = None):
     def inner(func):
@@ -1,13 +1,25 @@
 import abc
+import asyncio
+import re
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal, Optional, Dict
 
-from fastapi import Response
+import httpx
+from fastapi import Header, Query, Response
 
 from .base import Component, ScheduleRunnable, Servable, servable_endpoint
+from .streaming import RANGE_MAX_LIMIT, data_response, range_response
+from ..client import shared_client
+from ..data.latest import aretrieve_latest
 from ..data.retrieve import retrieve_latest_row_before_datetime
 from ..data.sync_db import get_or_create_standard_component_table
-from ..data.write import write_result
+from ..data.write import write_result, write_copy_of_latest
+
+# Returned by `collect` when the content did not change since the previous run, see
+# `Collector.get_not_modified_policy`
+NOT_MODIFIED = object()
 
 
 class Collector(Component, ScheduleRunnable, Servable, abc.ABC):
@@ -16,26 +28,169 @@ class Collector(Component, ScheduleRunnable, Servable, abc.ABC):
         return get_or_create_standard_component_table(self.get_configuration().name)
 
     @servable_endpoint(path="/")
-    def retrieve(self, timestamp: datetime = None) -> Response:
-        data = retrieve_latest_row_before_datetime(
-            self.get_table(),
-            timestamp if timestamp else datetime.now(),
-        )
+    async def retrieve(self, timestamp: datetime = None, if_none_match: Optional[str] = Header(None)) -> Response:
+        latest = await aretrieve_latest(self.get_configuration().name, self.get_table())
+        if timestamp is None:
+            return data_response(latest, timestamp, self.get_schedule(), if_none_match)
+
+        data = await asyncio.to_thread(retrieve_latest_row_before_datetime, self.get_table(), timestamp)
+        # Rows are written with the date of their run, after the latest committed one, unless runs overlap
+        settled_until = None
+        if latest is not None and self.get_overlap_policy() != "concurrent":
+            settled_until = latest.date
+        return data_response(data, timestamp, self.get_schedule(), if_none_match, settled_until)
 
-        return Response(content=data.data, media_type=data.content_type)
+    @servable_endpoint(path="/range")
+    async def retrieve_range(
+            self,
+            start: datetime = None,
+            end: datetime = None,
+            limit: int = Query(1000, ge=1, le=RANGE_MAX_LIMIT),
+            cursor: str = None,
+            format: Literal["ndjson", "multipart"] = "ndjson",
+    ) -> Response:
+        return range_response(self.get_table(), start, end, limit, cursor, format)
 
     def run(self) -> Any:
         result = self.collect()
 
+        if result is NOT_MODIFIED:
+            if self.get_not_modified_policy() == "copy":
+                write_copy_of_latest(self.get_configuration().name, self.get_table(), datetime.now())
+            return None
+
         if result is not None:
             config = self.get_configuration()
             write_result(config.name, config.content_type, self.get_table(), result, datetime.now())
 
         return result
 
+    def get_not_modified_policy(self) -> Literal["skip", "copy"]:
+        """
+        Return what a run records when `collect` returns `NOT_MODIFIED`: nothing (default), or a row pointing to the
+        latest row through its copy_id, which keeps one row per run without storing the content again.
+        """
+        return "skip"
+
     @abc.abstractmethod
     def collect(self) -> bytes:
         """
         Overrides the `collect` method to retrieve content from a distant data provider.
         """
         pass
+
+
+@dataclass
+class _Validators:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Monotonic time until which the content is known to be fresh
+    fresh_until: float = 0
+
+
+class AsyncCollector(Collector, abc.ABC):
+    """
+    Collector whose `acollect` coroutine runs on the event loop shared by all the asynchronous collectors of the
+    process, with a shared HTTP client. Its runs are dispatched on worker threads by default, so that many collectors
+    poll their endpoints concurrently from a single process.
+    """
+
+    def get_execution_mode(self) -> Literal["process", "thread"]:
+        return "thread"
+
+    def get_retries(self) -> int:
+        """Return the number of times a failed request is retried, on transport errors and 5xx responses."""
+        return 3
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The HTTP client shared by the asynchronous collectors of the process."""
+        return shared_client.client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request with the shared HTTP client, retrying with an exponential backoff on transport errors and
+        5xx responses.
+
+        :param method: The HTTP method
+        :param url: The URL
+        :param kwargs: The other arguments of `httpx.AsyncClient.request`
+        :return: The response, its status is raised for 4xx and 5xx responses
+        """
+        for attempt in range(self.get_retries() + 1):
+            try:
+                response = await self.http.request(method, url, **kwargs)
+                if response.status_code < 500 or attempt == self.get_retries():
+                    # Unlike the other 3xx, 304 is the expected answer to a conditional request
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == self.get_retries():
+                    raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """Send a GET request, see `request`."""
+        return await self.request("GET", url, **kwargs)
+
+    @property
+    def _validators(self) -> Dict[str, _Validators]:
+        return self.__dict__.setdefault("_validators_by_url", {})
+
+    async def conditional_get(self, url: str, **kwargs) -> Optional[httpx.Response]:
+        """
+        Send a GET request unless the content of the URL is known to be unchanged.
+
+        The validators (ETag, Last-Modified) of the previous response of the URL are sent along, so that the server
+        can answer 304 without a body. While the previous response is fresh, according to its Cache-Control max-age
+        or to `set_fresh_for` (e.g. with a GBFS ttl), no request is sent at all.
+
+        :param url: The URL
+        :param kwargs: The other arguments of `httpx.AsyncClient.request`
+        :return: The response, or None if the content did not change since the previous call
+        """
+        validators = self._validators.get(url)
+        if validators is not None and time.monotonic() < validators.fresh_until:
+            return None
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if validators is not None:
+            if validators.etag:
+                headers["If-None-Match"] = validators.etag
+            if validators.last_modified:
+                headers["If-Modified-Since"] = validators.last_modified
+
+        response = await self.request("GET", url, headers=headers, **kwargs)
+
+        if response.status_code != 304:
+            validators = self._validators[url] = _Validators(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+
+        max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if max_age:
+            self.set_fresh_for(url, int(max_age.group(1)))
+
+        return None if response.status_code == 304 else response
+
+    def set_fresh_for(self, url: str, seconds: Optional[float]):
+        """
+        Skip the requests of `conditional_get` to the URL for the given number of seconds, e.g. the GBFS ttl.
+
+        :param url: The URL
+        :param seconds: The number of seconds during which the content is fresh, ignored if None
+        """
+        if seconds is not None:
+            self._validators.setdefault(url, _Validators()).fresh_until = time.monotonic() + seconds
+
+    def collect(self) -> bytes:
+        return shared_client.run(self.acollect())
+
+    @abc.abstractmethod
+    async def acollect(self) -> bytes:
+        """
+        Overrides the `acollect` coroutine to retrieve content from a distant data provider, e.g. with `get`.
+        """
+        pass
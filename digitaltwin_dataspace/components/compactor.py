@@ -0,0 +1,58 @@
+import logging
+from datetime import datetime
+from typing import Any, List
+
+from .base import Component, ComponentConfiguration, ScheduleRunnable
+from ..data.columnar import PARQUET_CONTENT_TYPE
+from ..data.compaction import compact
+from ..data.sync_db import get_or_create_standard_component_table
+from ..utils import schedule_string_to_time_delta
+
+logger = logging.getLogger(__name__)
+
+
+class Compactor(Component, ScheduleRunnable):
+    """
+    Scheduled job rolling the closed time windows of components into one Parquet file per window, which cuts the
+    number of blobs kept in the storage and serves range queries over old windows with a single read.
+    See `digitaltwin_dataspace.data.compaction`.
+    """
+
+    def __init__(
+            self,
+            components: List[str],
+            window: str = "1h",
+            delay: str = "1h",
+            delete_blobs: bool = True,
+            schedule: str = "1h",
+    ):
+        """
+        :param components: Names of the components to compact
+        :param window: Duration of the windows, e.g. "1h" or "1d", one file is written per window and component
+        :param delay: Time after its end before a window is compacted, so that late rows are not missed, e.g. "1h"
+        :param delete_blobs: Whether to delete the original blobs once compacted
+        :param schedule: Schedule of the job
+        """
+        self.components = components
+        self.window = schedule_string_to_time_delta(window)
+        self.delay = schedule_string_to_time_delta(delay)
+        self.delete_blobs = delete_blobs
+        self.schedule = schedule
+
+    def get_configuration(self) -> ComponentConfiguration:
+        return ComponentConfiguration(
+            name="compactor",
+            description=f"Compacts the data of {', '.join(self.components)} into Parquet files",
+            content_type=PARQUET_CONTENT_TYPE,
+        )
+
+    def get_schedule(self) -> str:
+        return self.schedule
+
+    def run(self) -> Any:
+        before = datetime.now() - self.delay
+        for name in self.components:
+            try:
+                compact(name, get_or_create_standard_component_table(name), self.window, before, self.delete_blobs)
+            except Exception as e:
+                logger.exception(f"Failed to compact {name}: {e}")
@@ -1,14 +1,20 @@
 import abc
+import asyncio
+import time
+from bisect import bisect_left, bisect_right
 from datetime import timedelta, datetime
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Literal
 
-from fastapi import Response
+from fastapi import Header, Query, Response
 
 from .base import ScheduleRunnable, Servable, Component, servable_endpoint, ComponentConfiguration
-from ..data.retrieve import retrieve_latest_row, retrieve_first_row, retrieve_between_datetime, retrieve_after_datetime, \
-    retrieve_latest_rows_before_datetime, retrieve_latest_row_before_datetime
+from .streaming import RANGE_MAX_LIMIT, data_response, range_response
+from ..data.retrieve import Data, HarvesterState, retrieve_harvester_state, retrieve_latest_rows_before_datetime_many, \
+    retrieve_latest_row_before_datetime, retrieve_latest_dates
+from ..data.latest import aretrieve_latest
+from ..data.notify import notifications_are_global
 from ..data.sync_db import get_or_create_standard_component_table
-from ..data.write import write_result
+from ..data.write import write_result, write_results
 
 ZERO_DATE = datetime(1970, 1, 1)
 
@@ -74,6 +80,14 @@ class HarvesterConfiguration(ComponentConfiguration):
     dependencies: Optional[List[str]] = None
     dependencies_limit: Optional[List[int]] = None
 
+    # Catch-up, maximum number of consecutive source windows harvested in a single run (1 disables it),
+    # and optional wall time budget in seconds after which the run stops starting new windows
+    catch_up_max_windows: int = 1
+    catch_up_max_duration: Optional[float] = None
+
+    # Download the data of the source and dependency rows concurrently before harvesting
+    prefetch_data: bool = True
+
 
 class Harvester(Component, ScheduleRunnable, Servable, abc.ABC):
     def run(self):
@@ -83,64 +97,139 @@ class Harvester(Component, ScheduleRunnable, Servable, abc.ABC):
             configuration.source
         )
 
-        # Get latest date harvested
-        latest_row = retrieve_latest_row(table, with_null=True)
+        max_windows = max(configuration.catch_up_max_windows, 1)
 
-        if latest_row is None:
-            # In case the harvester has never been run, get the first row from the source table
-            row = retrieve_first_row(source_table)
-            # Minus one second to make sure we include the first row
-            latest_date = (row and (row.date - timedelta(seconds=1))) or ZERO_DATE
-        else:
-            latest_date = latest_row.date
+        def source_window(state: HarvesterState):
+            # Prefetch the source rows of all the windows that may be harvested in this run with a single query
+            start_date, end_date, limit = source_range_to_period_and_limit(
+                self._latest_date(state), configuration.source_range
+            )
+            if end_date:
+                for _ in range(max_windows - 1):
+                    _, end_date, _ = source_range_to_period_and_limit(end_date, configuration.source_range)
+                return start_date, end_date, None
+            return start_date, None, limit * max_windows
+
+        state = retrieve_harvester_state(table, source_table, source_window)
+        latest_date = self._latest_date(state)
+        source_rows = state.source_rows
+        source_dates = [row.date for row in source_rows]
+
+        deadline = None
+        if configuration.catch_up_max_duration is not None:
+            deadline = time.monotonic() + configuration.catch_up_max_duration
+
+        harvested = False
+        for _ in range(max_windows):
+            storage_date = self._harvest_window(
+                configuration, table, latest_date, state.latest_source_date, source_rows, source_dates
+            )
 
+            if storage_date is None:
+                break
+
+            harvested = True
+            latest_date = storage_date
+
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+        return harvested
+
+    @staticmethod
+    def _latest_date(state: HarvesterState) -> datetime:
+        if state.latest_date is None:
+            # In case the harvester has never been run, start from the first row of the source table
+            # Minus one second to make sure we include the first row
+            return (state.first_source_date and (state.first_source_date - timedelta(seconds=1))) or ZERO_DATE
+        return state.latest_date
+
+    def _harvest_window(
+            self,
+            configuration: HarvesterConfiguration,
+            table,
+            latest_date: datetime,
+            latest_source_date: Optional[datetime],
+            source_rows: List[Data],
+            source_dates: List[datetime],
+    ) -> Optional[datetime]:
+        """
+        Harvest the source window following the latest harvested date.
+
+        :param configuration: The configuration of the harvester
+        :param table: The table of the harvester
+        :param latest_date: The latest date harvested
+        :param latest_source_date: The date of the latest source row
+        :param source_rows: The prefetched source rows, sorted by date, covering the window
+        :param source_dates: The dates of the prefetched source rows
+        :return: The storage date of the harvested window, or None if there was nothing to harvest
+        """
         # Get source range
         start_date, end_date, limit = source_range_to_period_and_limit(
             latest_date, configuration.source_range
         )
 
-        source_data = retrieve_between_datetime(source_table, start_date, end_date, limit)
+        first = bisect_right(source_dates, start_date)
+        last = bisect_left(source_dates, end_date) if end_date else len(source_rows)
+        if limit:
+            last = min(last, first + limit)
+        source_data = source_rows[first:last]
+
+        if end_date:
+            # The period is closed once the source holds data after it
+            if latest_source_date is None or latest_source_date <= end_date:
+                return None  # No new data to harvest, still building the same period
+
+            if not source_data:
+                # Nothing was collected during this period, record it so that the next run moves past it
+                write_result(
+                    configuration.name, configuration.content_type, table, None, end_date
+                )
+                return end_date
 
         if not source_data:
-            return False  # No new data to harvest
+            return None  # No new data to harvest
 
         if limit and configuration.source_range_strict and len(source_data) < limit:
-            return False  # No new data to harvest, still building the amount of data specified by the limit
-
-        if end_date and not retrieve_after_datetime(table, latest_date, 1):
-            return False  # No new data to harvest, still building the same period
+            return None  # No new data to harvest, still building the amount of data specified by the limit
 
         storage_date = end_date or source_data[-1].date
 
         if limit == 1 and not end_date:
             source_data = source_data[0]
+        elif configuration.prefetch_data:
+            Data.prefetch(source_data)
 
         dependencies = configuration.dependencies or []
+        dependencies_limit = configuration.dependencies_limit or [1] * len(dependencies)
+
+        # Snapshot of all the dependencies in a single statement
+        dependencies_data = retrieve_latest_rows_before_datetime_many(
+            {
+                dependency: (get_or_create_standard_component_table(dependency), dependency_limit)
+                for dependency, dependency_limit in zip(dependencies, dependencies_limit)
+            },
+            storage_date,
+        )
 
-        dependencies_data = {}
-
-        if dependencies:
-            for dependency, dependency_limit in zip(
-                    dependencies, configuration.dependencies_limit
-            ):
-                dependency_table = get_or_create_standard_component_table(dependency)
-                dependency_data = retrieve_latest_rows_before_datetime(
-                    dependency_table, storage_date, dependency_limit
-                )
-
-                if dependency_limit == 1:
-                    if not dependency_data:
-                        raise ValueError(f"Dependency {dependency} not found")
+        for dependency, dependency_limit in zip(dependencies, dependencies_limit):
+            if dependency_limit == 1:
+                if not dependencies_data[dependency]:
+                    raise ValueError(f"Dependency {dependency} not found")
 
-                    dependency_data = dependency_data[0]
-                dependencies_data[dependency] = dependency_data
+                dependencies_data[dependency] = dependencies_data[dependency][0]
+            elif configuration.prefetch_data:
+                Data.prefetch(dependencies_data[dependency])
 
         result = self.harvest(source_data, **dependencies_data)
 
         if configuration.multiple_results:
-            for item, source in zip(result, source_data):
-                write_result(configuration.name, configuration.content_type, table, item,
-                             source.date)
+            write_results(
+                configuration.name,
+                configuration.content_type,
+                table,
+                [(item, source.date) for item, source in zip(result, source_data)],
+            )
         elif result is not None:
             write_result(
                 configuration.name, configuration.content_type, table, result, storage_date
@@ -150,7 +239,7 @@ class Harvester(Component, ScheduleRunnable, Servable, abc.ABC):
                 configuration.name, configuration.content_type, table, None, storage_date
             )
 
-        return True
+        return storage_date
 
     def harvest(self, source_data, **dependencies_data):
         """
@@ -159,16 +248,46 @@ class Harvester(Component, ScheduleRunnable, Servable, abc.ABC):
         raise NotImplementedError("The 'harvest' method must be implemented by subclasses.")
 
     @servable_endpoint(path="/")
-    def retrieve(self, timestamp: datetime = None) -> Response:
-        data = retrieve_latest_row_before_datetime(
-            get_or_create_standard_component_table(self.get_configuration().name),
-            timestamp if timestamp else datetime.now(),
-        )
-
-        return Response(content=data.data, media_type=data.content_type)
+    async def retrieve(self, timestamp: datetime = None, if_none_match: Optional[str] = Header(None)) -> Response:
+        name = self.get_configuration().name
+        table = get_or_create_standard_component_table(name)
+        if timestamp is None:
+            data = await aretrieve_latest(name, table)
+            # Runs are triggered by new source rows, so the latest row is revalidated on every request
+            return data_response(data, timestamp, None, if_none_match)
+
+        data = await asyncio.to_thread(retrieve_latest_row_before_datetime, table, timestamp)
+
+        # Harvested rows are dated after the latest harvested one, but a harvester still catching up on its source
+        # writes rows dated in the past
+        settled_until = None
+        if self.get_overlap_policy() != "concurrent":
+            source_table = get_or_create_standard_component_table(self.get_configuration().source)
+            latest_date, latest_source_date = await asyncio.to_thread(retrieve_latest_dates, table, source_table)
+            if latest_date is not None and latest_source_date is not None and latest_date >= latest_source_date:
+                settled_until = latest_date
+        return data_response(data, timestamp, None, if_none_match, settled_until)
+
+    @servable_endpoint(path="/range")
+    async def retrieve_range(
+            self,
+            start: datetime = None,
+            end: datetime = None,
+            limit: int = Query(1000, ge=1, le=RANGE_MAX_LIMIT),
+            cursor: str = None,
+            format: Literal["ndjson", "multipart"] = "ndjson",
+    ) -> Response:
+        table = get_or_create_standard_component_table(self.get_configuration().name)
+        return range_response(table, start, end, limit, cursor, format)
 
     def get_schedule(self) -> str:
-        return "1s"
+        # New source rows trigger a run as soon as they are committed, the schedule is only a fallback. Without
+        # LISTEN/NOTIFY, rows written outside of this process tree are only picked up by polling.
+        return "1m" if notifications_are_global() else "1s"
+
+    def get_triggers(self) -> List[str]:
+        source = self.get_configuration().source
+        return [source] if source else []
 
     def get_configuration(self) -> HarvesterConfiguration:
         """
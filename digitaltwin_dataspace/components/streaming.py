@@ -0,0 +1,234 @@
+import asyncio
+import base64
+import json
+import os
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Literal, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Table
+
+from ..data.compaction import is_compacted
+from ..data.retrieve import Data, retrieve_page
+from ..data.storage import READ_CONCURRENCY
+from ..utils import schedule_string_to_time_delta
+
+# Number of rows fetched from the database at once by the range endpoints
+RANGE_PAGE_SIZE = int(os.environ.get("RANGE_PAGE_SIZE", 100))
+
+# Maximum number of rows of a request to the range endpoints, larger ranges are resumed from the cursor of their last row
+RANGE_MAX_LIMIT = int(os.environ.get("RANGE_MAX_LIMIT", 10000))
+
+# Cache-Control of the rows retrieved before a past timestamp, which never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def cache_control(
+        data: Data, timestamp: Optional[datetime], schedule: Optional[str], settled_until: Optional[datetime] = None
+) -> str:
+    """
+    Return the Cache-Control header of a row retrieved as the latest one before a timestamp.
+
+    :param data: The row
+    :param timestamp: The timestamp of the request, None for the latest row
+    :param schedule: The schedule of the component, the latest row is then fresh until the next expected run.
+        None when new rows can come at any time, they are then revalidated on every request.
+    :param settled_until: Date until which no row can be written anymore, e.g. the date of the latest committed row
+        of a collector. Rows retrieved before a timestamp up to this date never change. None if unknown.
+    """
+    if timestamp is not None and settled_until is not None and timestamp <= settled_until:
+        return IMMUTABLE_CACHE_CONTROL
+
+    now = datetime.now()
+    try:
+        period = schedule_string_to_time_delta(schedule) if schedule else None
+    except ValueError:
+        # Daily schedules at a given time
+        period = None
+    if period is None:
+        return "no-cache"
+
+    max_age = int((data.date + period - now).total_seconds())
+    return f"public, max-age={max(max_age, 0)}, must-revalidate"
+
+
+def _matches(if_none_match: Optional[str], hash: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as for GET requests
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or any(tag.strip('"') == hash for tag in tags)
+
+
+def data_response(
+        data: Optional[Data],
+        timestamp: Optional[datetime],
+        schedule: Optional[str],
+        if_none_match: Optional[str] = None,
+        settled_until: Optional[datetime] = None,
+) -> Response:
+    """
+    Return the response of a retrieve endpoint: the data of the row, streamed, with its hash as ETag, its date as
+    Last-Modified and a Cache-Control derived from the schedule. A request whose If-None-Match holds the hash is
+    answered with 304 without reading the storage.
+
+    :param data: The row, None if there is none
+    :param timestamp: The timestamp of the request, None for the latest row
+    :param schedule: The schedule of the component, see `cache_control`
+    :param if_none_match: The If-None-Match header of the request
+    :param settled_until: Date until which no row can be written anymore, see `cache_control`
+    """
+    if data is None:
+        raise HTTPException(status_code=404, detail="No data")
+
+    headers = {"Cache-Control": cache_control(data, timestamp, schedule, settled_until)}
+    if data.date is not None:
+        headers["Last-Modified"] = format_datetime(data.date.astimezone(timezone.utc), usegmt=True)
+    if data.hash is not None:
+        headers["ETag"] = f'"{data.hash}"'
+        if _matches(if_none_match, data.hash):
+            return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(data.aiter_data(), media_type=data.content_type, headers=headers)
+
+
+def encode_cursor(data: Data) -> str:
+    """Return the cursor resuming a range right after a row."""
+    return f"{data.date.isoformat()}_{data.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        date, id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(date), int(id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+async def aiter_range(
+        table: Table,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        limit: Optional[int],
+        after: Optional[Tuple[datetime, int]] = None,
+        concurrency: int = READ_CONCURRENCY,
+) -> AsyncIterator[Tuple[Data, bytes]]:
+    """
+    Iterate over the rows of a table in [start_date, end_date) and their data, in order.
+
+    Rows are fetched page by page, and the data of the next `concurrency` rows is downloaded in the background while
+    the current one is consumed, so that memory stays bounded whatever the size of the range.
+
+    :param table: The table
+    :param start_date: Start of the range, included
+    :param end_date: End of the range, excluded
+    :param limit: Maximum number of rows, None for no limit
+    :param after: Date and id of the row to resume after
+    :param concurrency: Maximum number of concurrent downloads
+    :return: Async iterator over the rows and their data
+    """
+    pending = deque()
+    remaining = limit
+    exhausted = False
+
+    async def next_page():
+        nonlocal after, remaining, exhausted
+        size = RANGE_PAGE_SIZE if remaining is None else min(RANGE_PAGE_SIZE, remaining)
+        rows = await asyncio.to_thread(retrieve_page, table, start_date, end_date, size, after)
+        if len(rows) < size:
+            exhausted = True
+        if rows:
+            after = (rows[-1].date, rows[-1].id)
+        if remaining is not None:
+            remaining -= len(rows)
+            exhausted = exhausted or remaining <= 0
+
+        # The rows of a compacted file are read with a single read of the file
+        compacted = [row for row in rows if is_compacted(row._url)]
+        if compacted:
+            await asyncio.to_thread(Data.prefetch, compacted)
+        return rows
+
+    rows = deque()
+    try:
+        while True:
+            # Keep `concurrency` downloads ahead of the consumer
+            while len(pending) < concurrency and (rows or not exhausted):
+                if not rows:
+                    rows.extend(await next_page())
+                    if not rows:
+                        break
+                row = rows.popleft()
+                pending.append((row, asyncio.ensure_future(row.aread())))
+
+            if not pending:
+                return
+
+            row, task = pending.popleft()
+            yield row, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+def _ndjson_line(data: Data, content: bytes) -> bytes:
+    head = {
+        "date": data.date.isoformat(),
+        "hash": data.hash,
+        "content_type": data.content_type,
+        "cursor": encode_cursor(data),
+    }
+    # JSON content is embedded as is, trusting its content type, as parsing large blobs would block the event loop.
+    # Other content is encoded in base64
+    if data.content_type and "json" in data.content_type:
+        if not content.strip():
+            return json.dumps({**head, "data": None}).encode("utf-8") + b"\n"
+        # Line breaks can only be whitespace between the tokens of valid JSON
+        content = content.replace(b"\r", b" ").replace(b"\n", b" ")
+        return json.dumps(head)[:-1].encode("utf-8") + b', "data": ' + content + b"}\n"
+    head["encoding"] = "base64"
+    head["data"] = base64.b64encode(content).decode("ascii")
+    return json.dumps(head).encode("utf-8") + b"\n"
+
+
+def range_response(
+        table: Table,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int,
+        cursor: Optional[str],
+        format: Literal["ndjson", "multipart"],
+) -> StreamingResponse:
+    """
+    Stream the rows of a table in [start, end) as NDJSON, one object per row, or as a multipart/mixed body, one part
+    per row. Each row carries the cursor to pass to resume the range right after it.
+    """
+    rows = aiter_range(table, start, end, limit, decode_cursor(cursor) if cursor else None)
+
+    if format == "multipart":
+        boundary = uuid.uuid4().hex
+
+        async def parts():
+            async for data, content in rows:
+                yield (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {data.content_type}\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"X-Date: {data.date.isoformat()}\r\n"
+                    f"ETag: \"{data.hash}\"\r\n"
+                    f"X-Cursor: {encode_cursor(data)}\r\n\r\n"
+                ).encode("utf-8") + content + b"\r\n"
+            yield f"--{boundary}--\r\n".encode("utf-8")
+
+        return StreamingResponse(parts(), media_type=f"multipart/mixed; boundary={boundary}")
+
+    async def lines():
+        async for data, content in rows:
+            yield _ndjson_line(data, content)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,91 @@
+from typing import Dict, List, Set
+
+from .components.base import Component, ScheduleRunnable
+from .components.harvester import HarvesterConfiguration
+
+
+class CycleError(ValueError):
+    """Raised when the components depend on each other in a cycle."""
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__(f"Components form a dependency cycle: {' -> '.join(cycle)}")
+
+
+class ComponentGraph:
+    """
+    Directed acyclic graph of the components, built from their sources and dependencies.
+
+    An edge goes from a component to each component reading its rows: the harvesters using it as source or dependency,
+    and more generally the components listing it in `ScheduleRunnable.get_triggers()`. Only trigger edges start runs,
+    dependency edges only constrain the order.
+    """
+
+    def __init__(self, components: List[Component]):
+        """
+        :param components: The components of the graph
+        :raises CycleError: If the components depend on each other in a cycle
+        """
+        self.names: List[str] = [component.get_configuration().name for component in components]
+        self.upstream: Dict[str, Set[str]] = {name: set() for name in self.names}
+        self.downstream: Dict[str, Set[str]] = {name: set() for name in self.names}
+        self.triggers: Dict[str, Set[str]] = {name: set() for name in self.names}
+
+        for name, component in zip(self.names, components):
+            triggers = set(component.get_triggers()) if isinstance(component, ScheduleRunnable) else set()
+
+            configuration = component.get_configuration()
+            dependencies = set()
+            if isinstance(configuration, HarvesterConfiguration):
+                dependencies = set(configuration.dependencies or [])
+
+            for upstream in triggers | dependencies:
+                self.upstream[name].add(upstream)
+                self.downstream.setdefault(upstream, set()).add(name)
+            for upstream in triggers:
+                self.triggers.setdefault(upstream, set()).add(name)
+
+        self._check_cycles()
+
+    def external(self) -> Set[str]:
+        """Return the names referenced as source or dependency that are not components of the graph."""
+        return {name for name in self.downstream if name not in self.upstream}
+
+    def _check_cycles(self):
+        visiting, visited = [], set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise CycleError(visiting[visiting.index(name):] + [name])
+
+            visiting.append(name)
+            for downstream in sorted(self.downstream.get(name, ())):
+                visit(downstream)
+            visiting.pop()
+            visited.add(name)
+
+        for name in self.names:
+            visit(name)
+
+    def levels(self) -> List[List[str]]:
+        """
+        Return the components in topological order, grouped in levels: a component only depends on components of
+        previous levels, so the components of a level can run in parallel.
+        """
+        remaining = {name: len(self.upstream[name] & set(self.names)) for name in self.names}
+        levels = []
+        current = sorted(name for name, count in remaining.items() if count == 0)
+
+        while current:
+            levels.append(current)
+            following = []
+            for name in current:
+                for downstream in self.downstream.get(name, ()):
+                    remaining[downstream] -= 1
+                    if remaining[downstream] == 0:
+                        following.append(downstream)
+            current = sorted(following)
+
+        return levels
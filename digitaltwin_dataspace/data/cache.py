@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+class BlobCache:
+    """
+    Thread-safe in-memory LRU cache of blobs, bounded by the total size of the cached bytes.
+
+    Blobs are keyed on their MD5 hash: as a blob is content-addressed, a cached entry never goes stale.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: Memory budget of the cache in bytes, 0 disables the cache
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._statistics = CacheStatistics()
+
+    def get(self, key: str):
+        """
+        Get a blob from the cache, marking it as the most recently used.
+
+        :param key: The hash of the blob
+        :return: The blob, or None if it is not cached
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self._statistics.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._statistics.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        """
+        Add a blob to the cache, evicting the least recently used blobs to stay within the memory budget.
+        Blobs larger than the whole budget are not cached.
+
+        :param key: The hash of the blob
+        :param data: The blob
+        """
+        if data is None or len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+
+            self._entries[key] = data
+            self._size += len(data)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._statistics.evictions += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], bytes]) -> bytes:
+        """
+        Get a blob from the cache, loading and caching it on a miss.
+
+        :param key: The hash of the blob
+        :param loader: Function reading the blob from the storage
+        :return: The blob
+        """
+        data = self.get(key)
+        if data is None:
+            data = loader()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        with self._lock:
+            return CacheStatistics(
+                hits=self._statistics.hits,
+                misses=self._statistics.misses,
+                evictions=self._statistics.evictions,
+                entries=len(self._entries),
+                size=self._size,
+            )
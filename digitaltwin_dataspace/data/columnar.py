@@ -0,0 +1,177 @@
+import json
+import struct
+from typing import Any, Dict, Iterable, Optional
+
+from ..geojson import _flatten
+
+# Content types of the columnar formats, both require the optional `pyarrow` dependency
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+COLUMNAR_CONTENT_TYPES = (ARROW_CONTENT_TYPE, PARQUET_CONTENT_TYPE)
+
+# Compression codec of the columnar blobs
+COMPRESSION = "zstd"
+
+
+def _pyarrow():
+    # Imported on use, so that components storing JSON never load pyarrow
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "The columnar content types require pyarrow, install digitaltwin_dataspace[columnar]"
+        ) from error
+    return pyarrow
+
+
+def _with_geo_metadata(table, columns: Dict[str, Optional[dict]], geometry_types: Optional[list] = None):
+    """
+    Add the GeoParquet metadata describing the WKB encoded geometry columns of a table.
+
+    :param table: The table
+    :param columns: Mapping of the geometry columns, primary one first, to their CRS as PROJJSON, None for
+        longitude/latitude (OGC:CRS84)
+    :param geometry_types: Geometry types of the columns, if known
+    """
+    geo = {
+        "version": "1.0.0",
+        "primary_column": next(iter(columns)),
+        "columns": {
+            name: {
+                "encoding": "WKB",
+                "geometry_types": geometry_types or [],
+                **({"crs": crs} if crs is not None else {}),
+            }
+            for name, crs in columns.items()
+        },
+    }
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"geo"] = json.dumps(geo).encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+
+def points_to_table(records: Iterable[Dict[str, Any]], lon_key: str = "lon", lat_key: str = "lat"):
+    """
+    Convert records holding a longitude and a latitude, e.g. the bikes of a GBFS free_bike_status feed, to an Arrow
+    table with a WKB point "geometry" column, the columnar counterpart of `points_to_geojson`.
+
+    :param records: The records
+    :param lon_key: The key of the longitude
+    :param lat_key: The key of the latitude
+    :return: The table, with GeoParquet metadata
+    """
+    pa = _pyarrow()
+    rows = [_flatten(record) for record in records]
+
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    columns = [column for column in columns if column not in (lon_key, lat_key)]
+
+    table = pa.table({
+        **{column: [row.get(column) for row in rows] for column in columns},
+        # Little endian WKB point
+        "geometry": pa.array(
+            [struct.pack("<BIdd", 1, 1, row[lon_key], row[lat_key]) for row in rows], type=pa.binary()
+        ),
+    })
+    return _with_geo_metadata(table, {"geometry": None}, ["Point"])
+
+
+def _to_table(data):
+    pa = _pyarrow()
+
+    if isinstance(data, pa.Table):
+        return data
+
+    # GeoDataFrame: geometries are stored as WKB, as GeoParquet does
+    if hasattr(data, "geometry") and hasattr(data, "to_wkb"):
+        primary = data.geometry.name
+        names = [primary] + [
+            name for name, dtype in data.dtypes.items() if str(dtype) == "geometry" and name != primary
+        ]
+        table = pa.Table.from_pandas(data.to_wkb(), preserve_index=False)
+        return _with_geo_metadata(table, {
+            name: data[name].crs.to_json_dict() if data[name].crs is not None else None for name in names
+        })
+
+    if hasattr(data, "to_dict") and hasattr(data, "columns"):
+        return pa.Table.from_pandas(data, preserve_index=False)
+
+    # Records, missing keys are null
+    rows = list(data)
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    return pa.table({column: [row.get(column) for row in rows] for column in columns})
+
+
+def serialize(data, content_type: str, compression: Optional[str] = COMPRESSION) -> bytes:
+    """
+    Serialize tabular data to a columnar content type.
+
+    :param data: An Arrow table, a (Geo)DataFrame or a list of records
+    :param content_type: ARROW_CONTENT_TYPE or PARQUET_CONTENT_TYPE
+    :param compression: Compression codec, None to store the Arrow buffers uncompressed so they can be memory-mapped
+    :return: The serialized data
+    """
+    pa = _pyarrow()
+    table = _to_table(data)
+    sink = pa.BufferOutputStream()
+
+    if content_type == ARROW_CONTENT_TYPE:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    elif content_type == PARQUET_CONTENT_TYPE:
+        pa.parquet.write_table(table, sink, compression=compression or "none")
+    else:
+        raise ValueError(f"Unsupported columnar content type: {content_type}")
+
+    return sink.getvalue().to_pybytes()
+
+
+def deserialize(source, content_type: str):
+    """
+    Read columnar data as an Arrow table, without copying the buffers when possible.
+
+    :param source: The serialized data as bytes, or the path of a local file to memory-map
+    :param content_type: ARROW_CONTENT_TYPE or PARQUET_CONTENT_TYPE
+    :return: The table
+    """
+    pa = _pyarrow()
+
+    if isinstance(source, str):
+        source = pa.memory_map(source)
+    else:
+        source = pa.BufferReader(pa.py_buffer(source))
+
+    if content_type == ARROW_CONTENT_TYPE:
+        return pa.ipc.open_file(source).read_all()
+    if content_type == PARQUET_CONTENT_TYPE:
+        return pa.parquet.read_table(source)
+    raise ValueError(f"Unsupported columnar content type: {content_type}")
+
+
+def to_dataframe(table):
+    """
+    Convert an Arrow table to a DataFrame, or to a GeoDataFrame when it holds GeoParquet geometries and geopandas is
+    installed.
+
+    :param table: The table
+    :return: The DataFrame
+    """
+    dataframe = table.to_pandas()
+
+    geo = (table.schema.metadata or {}).get(b"geo")
+    if geo is None:
+        return dataframe
+
+    try:
+        import geopandas
+    except ImportError:
+        # Geometries stay WKB encoded
+        return dataframe
+
+    geo = json.loads(geo)
+    for name, column in geo["columns"].items():
+        dataframe[name] = geopandas.GeoSeries.from_wkb(dataframe[name], crs=column.get("crs", "OGC:CRS84"))
+    return geopandas.GeoDataFrame(dataframe, geometry=geo["primary_column"])
@@ -0,0 +1,229 @@
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import Table, select, func
+
+from .columnar import COMPRESSION, _pyarrow
+from .engine import engine
+from .storage import storage_manager
+from .sync_db import get_or_create_table_with_provider
+from .table import load_compacted_ranges_table
+from ..utils import round_datetime_to_previous_delta
+
+logger = logging.getLogger(__name__)
+
+# Name of the table recording the compacted windows of all the components
+COMPACTED_RANGES_TABLE = "compacted_ranges"
+
+# Prefix of the data column of the rows whose data was moved to a compacted file, followed by the URL of the file
+COMPACTED_PREFIX = "compacted+"
+
+# Target size of the row groups of the compacted files, the unit read to get a single blob
+ROW_GROUP_BYTES = int(os.environ.get("COMPACTED_ROW_GROUP_BYTES", 1024 * 1024))
+
+
+@dataclass
+class CompactedRange:
+    component: str
+    start_date: datetime
+    end_date: datetime
+    # URL of the Parquet file, None when the window had no data to move
+    url: Optional[str]
+    rows: int
+    size: int
+
+
+@lru_cache
+def get_compacted_ranges_table() -> Table:
+    return get_or_create_table_with_provider(
+        table_name=COMPACTED_RANGES_TABLE,
+        table_provider=partial(load_compacted_ranges_table, COMPACTED_RANGES_TABLE),
+    )
+
+
+def is_compacted(url: Optional[str]) -> bool:
+    """Return whether the data column of a row points to a compacted file."""
+    return url is not None and url.startswith(COMPACTED_PREFIX)
+
+
+def _open_compacted(url: str):
+    """
+    Open a compacted file, memory-mapped when the storage keeps it locally (file storage, disk cache), otherwise through
+    ranged reads, so that only its footer and the row groups read are downloaded, whatever the size of the file.
+    """
+    pa = _pyarrow()
+    path = storage_manager.local_path(url)
+    if path is not None:
+        return pa.parquet.ParquetFile(pa.memory_map(path))
+    return pa.parquet.ParquetFile(pa.PythonFile(storage_manager.open_ranged(url), mode="r"))
+
+
+def _may_contain(row_group, column: int, hashes: Set[str]) -> bool:
+    statistics = row_group.column(column).statistics
+    if statistics is None or not statistics.has_min_max:
+        return True
+    return any(statistics.min <= hash <= statistics.max for hash in hashes)
+
+
+def read_compacted(url: str, hashes: Optional[Iterable[str]] = None) -> Dict[str, bytes]:
+    """
+    Read the blobs stored in a compacted file. Files are sorted by hash, so only the row groups whose hash range holds
+    one of the hashes are decoded.
+
+    :param url: The data column of a compacted row, or the URL of the file
+    :param hashes: Hashes of the blobs to read, defaults to all of them
+    :return: Mapping of the hashes to the blobs
+    """
+    if is_compacted(url):
+        url = url[len(COMPACTED_PREFIX):]
+
+    file = _open_compacted(url)
+    row_groups = list(range(file.num_row_groups))
+    if hashes is not None:
+        hashes = set(hashes)
+        column = file.schema_arrow.get_field_index("hash")
+        row_groups = [
+            index for index in row_groups if _may_contain(file.metadata.row_group(index), column, hashes)
+        ]
+
+    table = file.read_row_groups(row_groups, columns=["hash", "data"])
+    blobs = dict(zip(table.column("hash").to_pylist(), table.column("data").to_pylist()))
+    if hashes is not None:
+        blobs = {hash: blob for hash, blob in blobs.items() if hash in hashes}
+    return blobs
+
+
+def compact_window(
+        name: str, table: Table, start_date: datetime, end_date: datetime, delete_blobs: bool = True
+) -> CompactedRange:
+    """
+    Move the blobs of the rows of a component in [start_date, end_date) into a single Parquet file.
+
+    The file has one row per blob with the date, hash, type and content of the row owning it. The data column of these
+    rows then points to the file, so that they are read from it, and the window is recorded in the compacted ranges
+    table. Rows pointing to another row through their copy_id are not changed.
+
+    :param name: The name of the component
+    :param table: The table of the component
+    :param start_date: Start of the window, included
+    :param end_date: End of the window, excluded
+    :param delete_blobs: Whether to delete the original blobs once the file is recorded
+    :return: The compacted range
+    """
+    pa = _pyarrow()
+    ranges = get_compacted_ranges_table()
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(table.c.id, table.c.date, table.c.data, table.c.hash, table.c.type)
+            .where(table.c.date >= start_date)
+            .where(table.c.date < end_date)
+            .where(table.c.copy_id.is_(None))
+            .where(table.c.data.isnot(None))
+            .where(table.c.data.notlike(f"{COMPACTED_PREFIX}%"))
+            .order_by(table.c.date.asc())
+        ).fetchall()
+
+    url, size = None, 0
+    if rows:
+        contents = storage_manager.read_many([row.data for row in rows], [row.hash for row in rows])
+
+        # Rows of a same hash share their blob in the file
+        blobs = {}
+        for row, content in zip(rows, contents):
+            blobs.setdefault(row.hash, (row, content))
+        # Sorted by hash, so that the statistics of the row groups locate a blob, see `read_compacted`
+        blobs = [blobs[hash] for hash in sorted(blobs)]
+
+        file = pa.table({
+            "date": pa.array([row.date for row, _ in blobs], type=pa.timestamp("us")),
+            "hash": [row.hash for row, _ in blobs],
+            "type": [row.type for row, _ in blobs],
+            "data": pa.array([content for _, content in blobs], type=pa.binary()),
+        })
+        average_size = max(sum(len(content) for _, content in blobs) // len(blobs), 1)
+        sink = pa.BufferOutputStream()
+        pa.parquet.write_table(
+            file,
+            sink,
+            compression=COMPRESSION,
+            use_dictionary=["type"],
+            row_group_size=max(ROW_GROUP_BYTES // average_size, 1),
+        )
+        content = sink.getvalue().to_pybytes()
+        size = len(content)
+        url = storage_manager.write(f"{name}/compacted/{start_date.strftime('%Y-%m-%d_%H-%M-%S')}.parquet", content)
+
+    with engine.connect() as connection:
+        if rows:
+            connection.execute(
+                table.update()
+                .where(table.c.id.in_([row.id for row in rows]))
+                .values(data=COMPACTED_PREFIX + url)
+            )
+        connection.execute(
+            ranges.insert().values(
+                component=name, start_date=start_date, end_date=end_date, data=url, rows=len(rows), size=size
+            )
+        )
+        connection.commit()
+
+    if delete_blobs:
+        for row in rows:
+            try:
+                storage_manager.delete(row.data)
+            except Exception as e:
+                logger.warning(f"Failed to delete compacted blob {row.data}: {e}")
+
+    return CompactedRange(name, start_date, end_date, url, len(rows), size)
+
+
+def compact(
+        name: str, table: Table, window: timedelta, before: datetime, delete_blobs: bool = True
+) -> List[CompactedRange]:
+    """
+    Compact the windows of a component ending before a date that are not compacted yet, see `compact_window`.
+    Windows without rows are skipped and not recorded.
+
+    :param name: The name of the component
+    :param table: The table of the component
+    :param window: Duration of the windows, e.g. one hour or one day
+    :param before: Date before which windows are closed, i.e. no row can be added to them anymore
+    :param delete_blobs: Whether to delete the original blobs once compacted
+    :return: The compacted ranges
+    """
+    ranges = get_compacted_ranges_table()
+    compacted = []
+
+    with engine.connect() as connection:
+        start_date = connection.execute(
+            select(func.max(ranges.c.end_date)).where(ranges.c.component == name)
+        ).scalar()
+
+    while True:
+        # Jump to the window of the next row
+        with engine.connect() as connection:
+            query = select(func.min(table.c.date))
+            if start_date is not None:
+                query = query.where(table.c.date >= start_date)
+            next_date = connection.execute(query).scalar()
+
+        if next_date is None:
+            break
+
+        start_date = round_datetime_to_previous_delta(next_date, window)
+        end_date = start_date + window
+        if end_date > before:
+            break
+
+        compacted.append(compact_window(name, table, start_date, end_date, delete_blobs))
+        logger.info(
+            f"Compacted {name} from {start_date} to {end_date}: {compacted[-1].rows} blobs, {compacted[-1].size} bytes"
+        )
+        start_date = end_date
+
+    return compacted
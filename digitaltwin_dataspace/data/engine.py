@@ -1,10 +1,49 @@
 import os
 from functools import lru_cache
 
-from sqlalchemy import create_engine, NullPool
+from sqlalchemy import create_engine, NullPool, QueuePool
 from sqlalchemy.engine import Engine
 
 
+def engine_arguments(database_url: str) -> dict:
+    """
+    Build the engine arguments for a database URL from the environment.
+
+    For Postgres, connections are pooled by default. The pool is configured with:
+    - DATABASE_POOL: "queue" (default) to keep a pool of connections in each process, or "null" to open a connection
+      per query
+    - DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT, DATABASE_POOL_RECYCLE: the usual SQLAlchemy
+      pool settings
+    - DATABASE_EXTERNAL_POOLER: set to "1" when connecting through an external pooler such as PgBouncer in transaction
+      mode, the pooler then owns the connections and server-side prepared statements are disabled
+
+    :param database_url: The database URL
+    :return: The keyword arguments of `create_engine`
+    """
+    args = {}
+    if "postgres" in database_url:
+        args["pool_pre_ping"] = True
+        args["client_encoding"] = "utf8"
+
+        if os.environ.get("DATABASE_EXTERNAL_POOLER", "0") == "1":
+            args["poolclass"] = NullPool
+            # Prepared statements do not survive a transaction-level pooler switching server connections
+            if "+psycopg" in database_url and "+psycopg2" not in database_url:
+                args["connect_args"] = {"prepare_threshold": None}
+            elif "+asyncpg" in database_url:
+                args["connect_args"] = {"statement_cache_size": 0}
+        elif os.environ.get("DATABASE_POOL", "queue") == "null":
+            args["poolclass"] = NullPool
+        else:
+            args["poolclass"] = QueuePool
+            args["pool_size"] = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+            args["max_overflow"] = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+            args["pool_timeout"] = float(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+            args["pool_recycle"] = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+
+    return args
+
+
 class LazyEngine:
     def __init__(self):
         self._engine = None
@@ -21,16 +60,12 @@ class LazyEngine:
     @lru_cache(maxsize=1)
     def _cached_engine(self) -> Engine:
         if self._engine is None:
-            args = {}
-            if "postgres" in os.environ.get("DATABASE_URL", ""):
-                args["pool_pre_ping"] = True
-                args["client_encoding"] = "utf8"
-                args["poolclass"] = NullPool
-                args["pool_recycle"] = 1800
-
+            database_url = os.environ.get("DATABASE_URL", "")
+            self._engine = create_engine(database_url, **engine_arguments(database_url))
 
-            self._engine = create_engine(os.environ.get("DATABASE_URL", ""), **args)
+            # A forked process must not reuse the pooled connections of its parent, drop them without closing them
+            os.register_at_fork(after_in_child=lambda: self._engine.dispose(close=False))
         return self._engine
 
 
-engine = LazyEngine().engine
\ No newline at end of file
+engine = LazyEngine().engine
@@ -0,0 +1,143 @@
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import Table, event, func, select
+from sqlalchemy.engine import Connection
+
+from .engine import engine
+from .retrieve import (
+    retrieve_latest_row,
+    retrieve_first_row,
+    retrieve_after_datetime,
+    retrieve_before_datetime,
+    _retrieve_between_datetime,
+    retrieve_page,
+    retrieve_latest_row_before_datetime,
+    retrieve_latest_rows_before_datetime_many,
+    retrieve_harvester_state,
+)
+from .sync_db import get_or_create_standard_component_table
+from .write import _latest_ids_by_hash
+
+# Queries checked, as functions of the table and of a date within its rows
+RETRIEVE_QUERIES: Dict[str, Callable[[Table, datetime], Any]] = {
+    "retrieve_latest_row": lambda table, date: retrieve_latest_row(table),
+    "retrieve_first_row": lambda table, date: retrieve_first_row(table),
+    "retrieve_after_datetime": lambda table, date: retrieve_after_datetime(table, date, 10),
+    "retrieve_before_datetime": lambda table, date: retrieve_before_datetime(table, date, 10),
+    "retrieve_between_datetime": lambda table, date: _retrieve_between_datetime(
+        table, date - timedelta(hours=1), date, 10
+    ),
+    "retrieve_page": lambda table, date: retrieve_page(table, date - timedelta(hours=1), date, 10, (date, 0)),
+    "retrieve_latest_row_before_datetime": lambda table, date: retrieve_latest_row_before_datetime(table, date),
+    "retrieve_latest_rows_before_datetime_many": lambda table, date: retrieve_latest_rows_before_datetime_many(
+        {table.name: (table, 10)}, date
+    ),
+    "retrieve_harvester_state": lambda table, date: retrieve_harvester_state(
+        table, table, lambda state: (date - timedelta(hours=1), date, 10)
+    ),
+    "write_results (deduplication)": lambda table, date: _deduplication_query(table),
+}
+
+
+def _deduplication_query(table: Table):
+    with engine.connect() as connection:
+        return _latest_ids_by_hash(connection, table, ["0" * 32])
+
+
+@dataclass
+class QueryPlan:
+    """Plan of a statement run by a retrieve function."""
+    function: str
+    statement: str
+    plan: List[str]
+    # Lines of the plan reading a whole table
+    sequential_scans: List[str] = field(default_factory=list)
+
+
+def _capture(function: Callable[[], Any]) -> List[tuple]:
+    """Run a function and return the statements it sent to the database, with their parameters."""
+    statements = []
+
+    def listener(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        function()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+
+def _explain(connection: Connection, statement: str, parameters) -> List[str]:
+    if connection.dialect.name == "postgresql":
+        return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)]
+    if connection.dialect.name == "sqlite":
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    raise ValueError(f"EXPLAIN is not supported for {connection.dialect.name}")
+
+
+def _is_sequential_scan(line: str, table_name: str) -> bool:
+    line = line.strip().lstrip("->").strip()
+    # Postgres: "Seq Scan on table", SQLite: "SCAN table" or "SCAN table_1" (alias) without an index, subqueries and
+    # constant rows are not tables
+    return line.startswith("Seq Scan") or (line.startswith(f"SCAN {table_name}") and " USING " not in line)
+
+
+def explain_retrieve(table: Table, date: Optional[datetime] = None, force_index: bool = False) -> List[QueryPlan]:
+    """
+    Report the plans of the statements run by the retrieve functions on a table, flagging the sequential scans, i.e.
+    the statements whose cost grows with the size of the table.
+
+    Postgres prefers sequential scans on small tables even when an index could serve the statement, so the plans are
+    only meaningful on tables of a realistic size, or with `force_index`.
+
+    :param table: The table
+    :param date: Date within the rows of the table used by the statements, defaults to the latest date of the table
+    :param force_index: On Postgres, disable sequential scans whenever another plan exists, to check that indexes can
+        serve every statement whatever the size of the table
+    :return: The plan of each statement
+    """
+    if date is None:
+        with engine.connect() as connection:
+            date = connection.execute(select(func.max(table.c.date))).scalar() or datetime.now()
+
+    plans = []
+    for name, query in RETRIEVE_QUERIES.items():
+        statements = _capture(lambda: query(table, date))
+        with engine.connect() as connection:
+            if force_index and connection.dialect.name == "postgresql":
+                connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in statements:
+                plan = _explain(connection, statement, parameters)
+                scans = [line for line in plan if _is_sequential_scan(line, table.name)]
+                plans.append(QueryPlan(name, statement, plan, scans))
+            connection.rollback()
+    return plans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the retrieve functions doing sequential scans on the tables of components, "
+                    "exits with status 1 if any does."
+    )
+    parser.add_argument("tables", nargs="+", help="Names of the components")
+    parser.add_argument("--force-index", action="store_true", help="Disable sequential scans on Postgres")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print the plans")
+    args = parser.parse_args()
+
+    found = False
+    for table_name in args.tables:
+        print(table_name)
+        for query_plan in explain_retrieve(get_or_create_standard_component_table(table_name), None, args.force_index):
+            found = found or bool(query_plan.sequential_scans)
+            status = "SEQUENTIAL SCAN" if query_plan.sequential_scans else "ok"
+            print(f"  {query_plan.function:<45} {status}")
+            for line in query_plan.plan if args.verbose else query_plan.sequential_scans:
+                print(f"      {line}")
+
+    sys.exit(1 if found else 0)
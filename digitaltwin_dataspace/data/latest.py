@@ -0,0 +1,126 @@
+import asyncio
+import ctypes
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Callable
+
+from sqlalchemy import Table
+
+from .retrieve import Data, retrieve_latest_row_before_datetime
+
+# Maximum age in seconds of a cached latest row, in case a new row is written without being notified
+LATEST_CACHE_MAX_AGE = float(os.environ.get("LATEST_CACHE_MAX_AGE", 60))
+
+
+class LatestCache:
+    """
+    Cache of the latest row of each component and of its data, answering "latest" requests without any database or
+    storage access.
+
+    Each process serving requests keeps its own copy of the rows, and the processes share one version counter per
+    component in shared memory. The scheduler bumps the counter of a component whenever it is notified of a new row
+    (see `NewRowChannel`), so that a copy is reloaded once, on the first request following a write.
+    Must be created before the serving processes are forked.
+    """
+
+    def __init__(self, names: List[str], max_age: float = LATEST_CACHE_MAX_AGE):
+        """
+        :param names: Names of the components
+        :param max_age: Maximum age in seconds of a cached row
+        """
+        self._slots = {name: slot for slot, name in enumerate(names)}
+        # Written by the listener thread of the scheduler only, so no lock is needed
+        self._versions = multiprocessing.Array(ctypes.c_longlong, max(len(names), 1), lock=False)
+        self.max_age = max_age
+        # Version, load time and row of each component, in the current process
+        self._entries: Dict[str, Tuple[int, float, Data]] = {}
+
+    def invalidate(self, name: str):
+        """
+        Mark the cached latest row of a component as stale in every process.
+
+        :param name: The name of the component
+        """
+        slot = self._slots.get(name)
+        if slot is not None:
+            self._versions[slot] += 1
+
+    def peek(self, name: str) -> Tuple[bool, Optional[Data]]:
+        """
+        Get the latest row of a component if the cached one is up to date, without loading it otherwise.
+
+        :param name: The name of the component
+        :return: Whether the cached row is up to date, and the row
+        """
+        slot = self._slots.get(name)
+        entry = self._entries.get(name)
+        if (
+                slot is not None
+                and entry is not None
+                and entry[0] == self._versions[slot]
+                and time.monotonic() - entry[1] < self.max_age
+        ):
+            return True, entry[2]
+        return False, None
+
+    def get(self, name: str, loader: Callable[[], Optional[Data]]) -> Optional[Data]:
+        """
+        Get the latest row of a component, with its data, loading it on the first request after a new row.
+
+        :param name: The name of the component
+        :param loader: Function retrieving the latest row from the database
+        :return: The latest row, None if the component has no row
+        """
+        slot = self._slots.get(name)
+        if slot is None:
+            return loader()
+
+        up_to_date, data = self.peek(name)
+        if up_to_date:
+            return data
+
+        version = self._versions[slot]
+        data = loader()
+        if data is not None:
+            Data.prefetch([data])
+        # Rows written after the version was read bump it again, so the entry cannot hide them
+        self._entries[name] = (version, time.monotonic(), data)
+        return data
+
+
+# Cache of the current process, set by the scheduler before forking the serving processes
+_latest_cache: Optional[LatestCache] = None
+
+
+def set_latest_cache(cache: Optional[LatestCache]):
+    global _latest_cache
+    _latest_cache = cache
+
+
+def retrieve_latest(name: str, table: Table) -> Optional[Data]:
+    """
+    Get the latest row of a component, through the latest row cache of the process if there is one.
+
+    :param name: The name of the component
+    :param table: The table of the component
+    :return: The latest row, None if the component has no row
+    """
+    def loader():
+        return retrieve_latest_row_before_datetime(table, datetime.now())
+
+    if _latest_cache is None:
+        return loader()
+    return _latest_cache.get(name, loader)
+
+
+async def aretrieve_latest(name: str, table: Table) -> Optional[Data]:
+    """
+    Asynchronous variant of `retrieve_latest`, answering from the event loop when the cached row is up to date.
+    """
+    if _latest_cache is not None:
+        up_to_date, data = _latest_cache.peek(name)
+        if up_to_date:
+            return data
+    return await asyncio.to_thread(retrieve_latest, name, table)
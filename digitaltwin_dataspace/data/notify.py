@@ -0,0 +1,135 @@
+import logging
+import multiprocessing
+import queue
+import select
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .engine import engine
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel on which the names of the components with new rows are notified
+CHANNEL = "dataspace_new_row"
+
+
+def notifications_are_global() -> bool:
+    """
+    Whether new rows are notified to every listener of the database (Postgres LISTEN/NOTIFY), or only to the
+    processes of the same `run_components` (in-process queue), in which case writers of other processes are only
+    picked up by polling.
+    """
+    return engine.dialect.name == "postgresql"
+
+
+class NewRowChannel:
+    """
+    Channel notifying the scheduler that a component committed a new row.
+
+    On Postgres, notifications go through LISTEN/NOTIFY and reach every scheduler connected to the database. On other
+    databases, they go through a queue shared by the scheduler and its worker processes.
+    """
+
+    def __init__(self):
+        self._queue = None if notifications_are_global() else multiprocessing.Queue()
+
+    def put(self, name: str):
+        """
+        Notify a new row committed by a process of this `run_components`. No-op with LISTEN/NOTIFY.
+
+        :param name: The name of the component
+        """
+        if self._queue is not None:
+            self._queue.put(name)
+
+    def listen(self, callback: Callable[[str], None]) -> threading.Thread:
+        """
+        Call the callback with the name of the component in a background thread, for every new row.
+
+        :param callback: Function called with the name of the component that committed a new row
+        :return: The listening thread
+        """
+        target = self._listen_queue if self._queue is not None else self._listen_postgres
+        thread = threading.Thread(target=target, args=(callback,), name="new-row-listener", daemon=True)
+        thread.start()
+        return thread
+
+    def _listen_queue(self, callback: Callable[[str], None]):
+        while True:
+            try:
+                name = self._queue.get()
+            except (EOFError, OSError):
+                return
+            self._dispatch(callback, name)
+
+    def _listen_postgres(self, callback: Callable[[str], None]):
+        while True:
+            raw_connection = None
+            try:
+                raw_connection = engine.raw_connection()
+                driver_connection = raw_connection.driver_connection
+                driver_connection.autocommit = True
+                cursor = driver_connection.cursor()
+                cursor.execute(f"LISTEN {CHANNEL}")
+
+                if callable(driver_connection.notifies):
+                    # psycopg 3
+                    for notification in driver_connection.notifies():
+                        self._dispatch(callback, notification.payload)
+                else:
+                    # psycopg2
+                    while True:
+                        if select.select([driver_connection], [], [], 60) == ([], [], []):
+                            continue
+                        driver_connection.poll()
+                        while driver_connection.notifies:
+                            self._dispatch(callback, driver_connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.exception(f"New row listener failed, reconnecting: {e}")
+                if raw_connection is not None:
+                    raw_connection.invalidate()
+                threading.Event().wait(5)
+
+    @staticmethod
+    def _dispatch(callback: Callable[[str], None], name: str):
+        try:
+            callback(name)
+        except Exception as e:
+            logger.exception(f"Failed to handle new row of {name}: {e}")
+
+
+# Channel of the current process, set by the scheduler and its workers on databases without LISTEN/NOTIFY
+_channel: Optional[NewRowChannel] = None
+
+
+def set_channel(channel: Optional[NewRowChannel]):
+    global _channel
+    _channel = channel
+
+
+def publish_new_row(connection: Connection, name: str):
+    """
+    Publish a new row of a component within the transaction that writes it.
+    With LISTEN/NOTIFY, the notification is only delivered if the transaction commits.
+
+    :param connection: The connection writing the row, before commit
+    :param name: The name of the component
+    """
+    if notifications_are_global():
+        connection.execute(text("SELECT pg_notify(:channel, :name)"), {"channel": CHANNEL, "name": name})
+
+
+def published_new_row(name: str):
+    """
+    Publish a new row of a component once the transaction that wrote it committed.
+
+    :param name: The name of the component
+    """
+    if _channel is not None:
+        try:
+            _channel.put(name)
+        except (ValueError, OSError, queue.Full):
+            pass
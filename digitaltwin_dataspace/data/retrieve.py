@@ -1,14 +1,17 @@
+import asyncio
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Iterator, AsyncIterator, Callable, Tuple, Dict
 
-from sqlalchemy import Table, select
+from sqlalchemy import Table, select, func, literal, union_all
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql.functions import coalesce
 
+from .columnar import COLUMNAR_CONTENT_TYPES, deserialize, to_dataframe
+from .compaction import is_compacted, read_compacted
 from .engine import engine
-from .storage import storage_manager
+from .storage import storage_manager, CHUNK_SIZE
 
 
 @dataclass
@@ -17,10 +20,120 @@ class Data:
     hash: str
     _url: str
     content_type: str = None
+    # Data filled by `prefetch`
+    _content: Optional[bytes] = field(default=None, repr=False, compare=False)
+    # Id of the row, used as a tie-breaker of the date to paginate
+    id: Optional[int] = field(default=None, repr=False, compare=False)
 
     @property
     def data(self) -> bytes:
-        return storage_manager.read(self._url)
+        if self._content is not None:
+            return self._content
+        if is_compacted(self._url):
+            return self._read_compacted()
+        return storage_manager.read_cached(self._url, self.hash)
+
+    def _read_compacted(self) -> bytes:
+        if storage_manager.cache is None:
+            return read_compacted(self._url, [self.hash])[self.hash]
+        return storage_manager.cache.get_or_load(self.hash, lambda: read_compacted(self._url, [self.hash])[self.hash])
+
+    @staticmethod
+    def prefetch(rows: List["Data"], max_workers: Optional[int] = None) -> List["Data"]:
+        """
+        Download the data of several rows concurrently and keep it on each row, so that accessing `data` afterward
+        does not hit the storage anymore.
+
+        :param rows: The rows to fill
+        :param max_workers: Maximum number of concurrent downloads, defaults to the storage read concurrency
+        :return: The rows
+        """
+        pending = [row for row in rows if row._content is None and row._url is not None]
+
+        # Compacted rows are read with one read per compacted file
+        compacted: Dict[str, List[Data]] = {}
+        for row in pending:
+            if is_compacted(row._url):
+                compacted.setdefault(row._url, []).append(row)
+        for url, compacted_rows in compacted.items():
+            contents = read_compacted(url, {row.hash for row in compacted_rows})
+            for row in compacted_rows:
+                row._content = contents[row.hash]
+
+        pending = [row for row in pending if row._content is None]
+        if pending:
+            contents = storage_manager.read_many(
+                [row._url for row in pending], [row.hash for row in pending], max_workers
+            )
+            for row, content in zip(pending, contents):
+                row._content = content
+        return rows
+
+    async def aread(self) -> bytes:
+        """Asynchronous variant of `data`."""
+        if self._content is not None:
+            return self._content
+        if is_compacted(self._url):
+            return await asyncio.to_thread(self._read_compacted)
+        return await storage_manager.aread_cached(self._url, self.hash)
+
+    def iter_data(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Stream the data as chunks of at most `chunk_size` bytes."""
+        if self._content is not None or is_compacted(self._url):
+            return _chunks(self.data, chunk_size)
+        return storage_manager.iter_read_cached(self._url, self.hash, chunk_size)
+
+    async def aiter_data(self, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Asynchronous variant of `iter_data`."""
+        if self._content is not None or is_compacted(self._url):
+            for chunk in _chunks(await self.aread(), chunk_size):
+                yield chunk
+            return
+        async for chunk in storage_manager.aiter_read_cached(self._url, self.hash, chunk_size):
+            yield chunk
+
+    def as_table(self, memory_map: bool = True):
+        """
+        Read columnar data (Arrow IPC or Parquet content type) as a pyarrow Table.
+
+        The table is built over the bytes already in memory (prefetched or cached) without copying them, otherwise
+        over a memory-mapped local file when the storage has one, otherwise over the bytes read from the storage.
+
+        :param memory_map: Whether to memory-map the local file of the data, if any
+        :return: The table
+        """
+        if self.content_type not in COLUMNAR_CONTENT_TYPES:
+            raise ValueError(f"Data of content type {self.content_type} is not columnar")
+
+        content = self._content
+        if content is None and storage_manager.cache is not None and self.hash is not None:
+            content = storage_manager.cache.get(self.hash)
+        if content is None and memory_map and not is_compacted(self._url):
+            path = storage_manager.local_path(self._url)
+            if path is not None:
+                return deserialize(path, self.content_type)
+
+        return deserialize(content if content is not None else self.data, self.content_type)
+
+    def as_dataframe(self, memory_map: bool = True):
+        """
+        Read columnar data as a DataFrame, or as a GeoDataFrame when it has GeoParquet geometries and geopandas is
+        installed.
+
+        :param memory_map: Whether to memory-map the local file of the data, if any
+        :return: The DataFrame
+        """
+        return to_dataframe(self.as_table(memory_map))
+
+
+def _chunks(data: bytes, chunk_size: int) -> Iterator[bytes]:
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+def row_to_data(row) -> Data:
+    """Convert a row of `base_query` to a Data object."""
+    return Data(date=row.date, _url=row.data, content_type=row.type, hash=row.hash, id=row.id)
 
 
 def data_result(func) -> Optional[Union[Data, List[Data]]]:
@@ -32,12 +145,9 @@ def data_result(func) -> Optional[Union[Data, List[Data]]]:
 
         # If the result is a single row, return a single Data object
         if not isinstance(result, list):
-            return Data(date=result.date, _url=result.data, content_type=result.type, hash=result.hash)
+            return row_to_data(result)
 
-        return [
-            Data(date=row.date, _url=row.data, content_type=row.type, hash=row.hash)
-            for row in result
-        ]
+        return [row_to_data(row) for row in result]
 
     return wrapper
 
@@ -120,9 +230,21 @@ def retrieve_before_datetime(table: Table, date: datetime, limit: int) -> List[D
         ).fetchall()
 
 
-@data_result
 def retrieve_between_datetime(
     table: Table, start_date: datetime, end_date: datetime, limit: int
+) -> List[Data]:
+    """
+    Get the rows of a table between two dates, sorted by date.
+    The rows of compacted windows are filled with a single read of their compacted file.
+    """
+    rows = _retrieve_between_datetime(table, start_date, end_date, limit)
+    Data.prefetch([row for row in rows if is_compacted(row._url)])
+    return rows
+
+
+@data_result
+def _retrieve_between_datetime(
+    table: Table, start_date: datetime, end_date: datetime, limit: int
 ) -> List[Data]:
     with engine.connect() as connection:
         if start_date is None:
@@ -149,6 +271,41 @@ def retrieve_between_datetime(
             ).fetchall()
 
 
+@data_result
+def retrieve_page(
+    table: Table,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> List[Data]:
+    """
+    Get a page of the rows of a table in [start_date, end_date), sorted by date and id.
+    Pages are chained through the date and id of the last row of the previous page (keyset pagination), so that
+    each page costs the same whatever its position in the range.
+
+    :param table: The table
+    :param start_date: Start of the range, included, None for no bound
+    :param end_date: End of the range, excluded, None for no bound
+    :param limit: Maximum number of rows of the page
+    :param after: Date and id of the last row of the previous page
+    :return: The rows
+    """
+    query = base_query(table)
+    if start_date is not None:
+        query = query.where(table.c.date >= start_date)
+    if end_date is not None:
+        query = query.where(table.c.date < end_date)
+    if after is not None:
+        after_date, after_id = after
+        query = query.where((table.c.date > after_date) | ((table.c.date == after_date) & (table.c.id > after_id)))
+
+    with engine.connect() as connection:
+        return connection.execute(
+            query.order_by(table.c.date.asc(), table.c.id.asc()).limit(limit)
+        ).fetchall()
+
+
 @data_result
 def retrieve_latest_rows_before_datetime(
     table: Table, date: datetime, limit: int
@@ -173,3 +330,114 @@ def retrieve_latest_row_before_datetime(
             .order_by(table.c.date.desc())
             .limit(1)
         ).fetchone()
+
+
+@dataclass
+class HarvesterState:
+    # Latest date harvested, including rows without data
+    latest_date: Optional[datetime]
+    # First and latest dates of the source rows with data
+    first_source_date: Optional[datetime]
+    latest_source_date: Optional[datetime]
+    # Source rows of the window(s) to harvest, sorted by date
+    source_rows: List[Data] = field(default_factory=list)
+
+
+def retrieve_harvester_state(
+    table: Table,
+    source_table: Table,
+    source_window: Callable[[HarvesterState], Tuple[datetime, Optional[datetime], Optional[int]]],
+) -> HarvesterState:
+    """
+    Gather the state of a harvester in a single transaction of at most two statements: the latest harvested date
+    and the bounds of the source table in one, then the source rows to harvest.
+
+    :param table: The table of the harvester
+    :param source_table: The table of the source component
+    :param source_window: Function returning the start date, end date and limit of the source rows to fetch,
+        given the dates of the state
+    :return: The state of the harvester
+    """
+    with_data = (source_table.c.copy_id.isnot(None)) | (source_table.c.hash.isnot(None))
+
+    with engine.connect() as connection:
+        latest_date, first_source_date, latest_source_date = connection.execute(
+            select(
+                select(func.max(table.c.date)).scalar_subquery(),
+                select(func.min(source_table.c.date)).where(with_data).scalar_subquery(),
+                select(func.max(source_table.c.date)).where(with_data).scalar_subquery(),
+            )
+        ).one()
+
+        state = HarvesterState(latest_date, first_source_date, latest_source_date)
+        start_date, end_date, limit = source_window(state)
+
+        # Skip the second statement when the source holds nothing new
+        if latest_source_date is None or latest_source_date <= start_date:
+            return state
+
+        query = base_query(source_table).where(source_table.c.date > start_date)
+        if end_date is not None:
+            query = query.where(source_table.c.date < end_date)
+
+        state.source_rows = [
+            row_to_data(row)
+            for row in connection.execute(query.order_by(source_table.c.date.asc()).limit(limit)).fetchall()
+        ]
+
+    return state
+
+
+def retrieve_latest_dates(table: Table, source_table: Table) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Get the latest date of a harvester and of its source with a single statement.
+
+    :param table: The table of the harvester, rows without data included
+    :param source_table: The table of the source component, rows with data only
+    :return: The latest date of each table, None if it has no row
+    """
+    with_data = (source_table.c.copy_id.isnot(None)) | (source_table.c.hash.isnot(None))
+
+    with engine.connect() as connection:
+        return tuple(connection.execute(
+            select(
+                select(func.max(table.c.date)).scalar_subquery(),
+                select(func.max(source_table.c.date)).where(with_data).scalar_subquery(),
+            )
+        ).one())
+
+
+def retrieve_latest_rows_before_datetime_many(
+    tables: Dict[str, Tuple[Table, int]], date: datetime
+) -> Dict[str, List[Data]]:
+    """
+    Get the latest rows before a date from several tables with a single statement.
+
+    :param tables: Mapping of names to a table and the number of rows to get from it
+    :param date: The date
+    :return: Mapping of the same names to the rows, sorted by date descending
+    """
+    if not tables:
+        return {}
+
+    queries = []
+    for name, (table, limit) in tables.items():
+        subquery = (
+            base_query(table)
+            .where(table.c.date < date)
+            .order_by(table.c.date.desc())
+            .limit(limit)
+            .subquery()
+        )
+        queries.append(select(literal(name).label("name"), *subquery.c).select_from(subquery))
+
+    with engine.connect() as connection:
+        rows = connection.execute(queries[0] if len(queries) == 1 else union_all(*queries)).fetchall()
+
+    results = {name: [] for name in tables}
+    for row in rows:
+        results[row.name].append(row_to_data(row))
+    for name in results:
+        results[name].sort(key=lambda data: data.date, reverse=True)
+
+    return results
@@ -1,10 +1,110 @@
 import abc
+import asyncio
+import hashlib
+import io
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Iterator, AsyncIterator, List
 
 from azure.storage.blob import BlobServiceClient
 
+from .cache import BlobCache
+
+# Size of the chunks yielded when streaming blobs
+CHUNK_SIZE = 1024 * 1024
+
+# Default number of blobs downloaded concurrently by `read_many`
+READ_CONCURRENCY = int(os.environ.get("BLOB_READ_CONCURRENCY", 8))
+
+# Default number of blobs uploaded concurrently by `write_many`
+WRITE_CONCURRENCY = int(os.environ.get("BLOB_WRITE_CONCURRENCY", 8))
+
+# Share of its size cap to which the disk cache is reduced once it exceeds it, so that it is not scanned on every write
+DISK_CACHE_EVICTION_TARGET = 0.9
+
+
+async def _iterate_in_thread(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Consume a blocking iterator from a worker thread, one item at a time, without blocking the event loop."""
+    done = object()
+    # A cancelled read keeps running in its thread, the iterator is closed once it is over
+    lock = threading.Lock()
+
+    def read():
+        with lock:
+            return next(iterator, done)
+
+    def close():
+        with lock:
+            getattr(iterator, "close", lambda: None)()
+
+    try:
+        while True:
+            chunk = await asyncio.to_thread(read)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Release the download when the consumer stops early, e.g. when the client disconnects
+        asyncio.get_running_loop().run_in_executor(None, close)
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Seekable read-only file over a blob, fetching only the byte ranges read, e.g. for a Parquet reader to get the
+    footer and the row groups it needs without downloading the whole blob.
+    """
+
+    def __init__(self, storage: "StorageManager", file_name: str):
+        self.storage = storage
+        self.file_name = file_name
+        self._size: Optional[int] = None
+        self._position = 0
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = self.storage.size(self.file_name)
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        end = self.size if size is None or size < 0 else min(self._position + size, self.size)
+        if end <= self._position:
+            return b""
+        data = self.storage.read_range(self.file_name, self._position, end - self._position)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
 
 class StorageManager(abc.ABC):
+    # In-memory cache of the blobs read through `read_cached`
+    cache: Optional[BlobCache] = None
+
     @abc.abstractmethod
     def write(self, file_name: str, data: bytes): ...
 
@@ -14,16 +114,180 @@ class StorageManager(abc.ABC):
     @abc.abstractmethod
     def delete(self, file_name: str): ...
 
+    def local_path(self, file_name: str) -> Optional[str]:
+        """
+        Return the path of a local file holding the data, e.g. to memory-map it, or None if there is none.
+
+        :param file_name: Name of the file.
+        """
+        return None
+
+    def close(self):
+        """Release the connections held by the storage manager."""
+
+    def size(self, file_name: str) -> int:
+        """
+        Return the size of a file in bytes.
+        Storage managers able to get it without reading the file should override this method.
+
+        :param file_name: Name of the file.
+        """
+        return len(self.read(file_name))
+
+    def read_range(self, file_name: str, offset: int, length: int) -> bytes:
+        """
+        Read a byte range of a file.
+        Storage managers able to read a range without reading the whole file should override this method.
+
+        :param file_name: Name of the file to read from.
+        :param offset: Position of the first byte to read.
+        :param length: Number of bytes to read, fewer are returned at the end of the file.
+        :return: Data read as bytes.
+        """
+        return self.read(file_name)[offset:offset + length]
+
+    def open_ranged(self, file_name: str) -> RangedReader:
+        """
+        Open a file as a seekable file object reading only the byte ranges it is asked for.
+
+        :param file_name: Name of the file to open.
+        """
+        return RangedReader(self, file_name)
+
+    def read_cached(self, file_name: str, key: Optional[str]) -> bytes:
+        """
+        Read data through the in-memory cache of the storage manager.
+
+        :param file_name: Name of the file to read from.
+        :param key: Hash of the data, used as the cache key. If None, the cache is bypassed.
+        :return: Data read from the cache or the storage as bytes.
+        """
+        if self.cache is None or key is None:
+            return self.read(file_name)
+
+        return self.cache.get_or_load(key, lambda: self.read(file_name))
+
+    def read_many(
+            self, file_names: List[str], keys: Optional[List[Optional[str]]] = None, max_workers: Optional[int] = None
+    ) -> List[bytes]:
+        """
+        Read several files concurrently, through the in-memory cache.
+        Files sharing the same key are only read once.
+
+        :param file_names: Names of the files to read from.
+        :param keys: Hashes of the data, used as cache keys, in the same order as the file names.
+        :param max_workers: Maximum number of concurrent reads, defaults to `READ_CONCURRENCY`.
+        :return: Data read from each file, in the same order as the file names.
+        """
+        keys = keys or [None] * len(file_names)
+
+        # Read each distinct blob once
+        unique = {}
+        for file_name, key in zip(file_names, keys):
+            unique.setdefault(key or file_name, (file_name, key))
+
+        if len(unique) <= 1:
+            results = {identifier: self.read_cached(*args) for identifier, args in unique.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers or READ_CONCURRENCY, len(unique))) as executor:
+                futures = {
+                    identifier: executor.submit(self.read_cached, *args) for identifier, args in unique.items()
+                }
+                results = {identifier: future.result() for identifier, future in futures.items()}
+
+        return [results[key or file_name] for file_name, key in zip(file_names, keys)]
+
+    def write_many(self, file_names: List[str], data: List[bytes], max_workers: Optional[int] = None) -> List[str]:
+        """
+        Write several files concurrently.
+
+        :param file_names: Names of the files to write to.
+        :param data: Data to write to each file, in the same order as the file names.
+        :param max_workers: Maximum number of concurrent writes, defaults to `WRITE_CONCURRENCY`.
+        :return: URL of each file, in the same order as the file names.
+        """
+        if len(file_names) <= 1:
+            return [self.write(file_name, content) for file_name, content in zip(file_names, data)]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers or WRITE_CONCURRENCY, len(file_names))) as executor:
+            return list(executor.map(self.write, file_names, data))
+
+    def iter_read(self, file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read data as a stream of chunks, so that the whole data is never buffered in memory.
+        Storage managers able to stream should override this method, the default reads the data at once.
+
+        :param file_name: Name of the file to read from.
+        :param chunk_size: Maximum size of the chunks in bytes.
+        :return: Iterator over the chunks of data.
+        """
+        yield self.read(file_name)
+
+    def iter_read_cached(self, file_name: str, key: Optional[str], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream data from the in-memory cache if it holds it, otherwise from the storage, without caching it.
+
+        :param file_name: Name of the file to read from.
+        :param key: Hash of the data, used as the cache key. If None, the cache is bypassed.
+        :param chunk_size: Maximum size of the chunks in bytes.
+        :return: Iterator over the chunks of data.
+        """
+        data = self.cache.get(key) if self.cache is not None and key is not None else None
+
+        if data is None:
+            yield from self.iter_read(file_name, chunk_size)
+            return
+
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+
+    async def awrite(self, file_name: str, data: bytes):
+        """Asynchronous variant of `write`."""
+        return await asyncio.to_thread(self.write, file_name, data)
+
+    async def aread(self, file_name: str) -> bytes:
+        """Asynchronous variant of `read`."""
+        return await asyncio.to_thread(self.read, file_name)
+
+    async def aread_cached(self, file_name: str, key: Optional[str]) -> bytes:
+        """Asynchronous variant of `read_cached`."""
+        return await asyncio.to_thread(self.read_cached, file_name, key)
+
+    async def adelete(self, file_name: str):
+        """Asynchronous variant of `delete`."""
+        return await asyncio.to_thread(self.delete, file_name)
+
+    def aiter_read(self, file_name: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Asynchronous variant of `iter_read`."""
+        return _iterate_in_thread(self.iter_read(file_name, chunk_size))
+
+    def aiter_read_cached(self, file_name: str, key: Optional[str], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Asynchronous variant of `iter_read_cached`."""
+        return _iterate_in_thread(self.iter_read_cached(file_name, key, chunk_size))
+
 
 class AzureBlobManager(StorageManager):
     def __init__(self, connection_string, container_name):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self._connect()
+
+        # A forked process must not share the connections of its parent
+        os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
         self.blob_service_client = BlobServiceClient.from_connection_string(
-            connection_string
+            self.connection_string,
+            # Size of the ranged requests of the downloads beyond their first request, i.e. of the streamed chunks
+            max_chunk_get_size=CHUNK_SIZE,
         )
         self.container_client = self.blob_service_client.get_container_client(
-            container_name
+            self.container_name
         )
 
+    def close(self):
+        self.blob_service_client.close()
+
     def write(self, file_name: str, data: bytes) -> str:
         """
         Write data to a blob in Azure Blob Storage.
@@ -55,6 +319,48 @@ class AzureBlobManager(StorageManager):
         blob_data = blob_client.download_blob().readall()
         return blob_data
 
+    def size(self, file_name: str) -> int:
+        """
+        Return the size of a blob in Azure Blob Storage, from its properties.
+
+        :param file_name: Name of the blob.
+        """
+        blob_client = self.container_client.get_blob_client(
+            file_name.split(self.container_client.container_name + "/")[1]
+        )
+        return blob_client.get_blob_properties().size
+
+    def read_range(self, file_name: str, offset: int, length: int) -> bytes:
+        """
+        Read a byte range of a blob in Azure Blob Storage with a ranged request.
+
+        :param file_name: Name of the blob to read from.
+        :param offset: Position of the first byte to read.
+        :param length: Number of bytes to read.
+        :return: Data read as bytes.
+        """
+        blob_client = self.container_client.get_blob_client(
+            file_name.split(self.container_client.container_name + "/")[1]
+        )
+        return blob_client.download_blob(offset=offset, length=length).readall()
+
+    def iter_read(self, file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read data from a blob in Azure Blob Storage as a stream of chunks.
+
+        :param file_name: Name of the blob to read from.
+        :param chunk_size: Maximum size of the chunks in bytes.
+        :return: Iterator over the chunks of data.
+        """
+        blob_client = self.container_client.get_blob_client(
+            file_name.split(self.container_client.container_name + "/")[1]
+        )
+        # Closing the generator stops the remaining ranged requests
+        for chunk in blob_client.download_blob().chunks():
+            # Chunks are at most CHUNK_SIZE long
+            for offset in range(0, len(chunk), chunk_size):
+                yield chunk[offset:offset + chunk_size]
+
     def delete(self, file_name: str):
         """
         Delete a blob in Azure Blob Storage.
@@ -98,6 +404,26 @@ class FileStorageManager(StorageManager):
         with open(file_name, "rb") as file:
             return file.read()
 
+    def size(self, file_name: str) -> int:
+        return os.path.getsize(file_name)
+
+    def read_range(self, file_name: str, offset: int, length: int) -> bytes:
+        with open(file_name, "rb") as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def iter_read(self, file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read data from a file in the local file system as a stream of chunks.
+
+        :param file_name: Name of the file to read from.
+        :param chunk_size: Maximum size of the chunks in bytes.
+        :return: Iterator over the chunks of data.
+        """
+        with open(file_name, "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+
     def delete(self, file_name: str):
         """
         Delete a file in the local file system.
@@ -106,6 +432,200 @@ class FileStorageManager(StorageManager):
         """
         os.remove(file_name)
 
+    def local_path(self, file_name: str) -> Optional[str]:
+        return file_name
+
+
+class DiskCachedStorageManager(StorageManager):
+    """
+    Storage manager keeping a local on-disk copy of the blobs of another storage manager.
+
+    Reads are served from the local directory when possible and fill it otherwise, writes go to both (write-through),
+    so a freshly written blob never has to be downloaded again on this host. Cached files are keyed on the blob URL,
+    written atomically, and evicted least recently used first once the directory exceeds its size cap, down to
+    `DISK_CACHE_EVICTION_TARGET` of it. The directory can be shared by several processes.
+    """
+
+    def __init__(self, storage: StorageManager, directory: str, max_bytes: int):
+        """
+        :param storage: The storage manager holding the blobs, e.g. an `AzureBlobManager`
+        :param directory: The local cache directory
+        :param max_bytes: Maximum size of the cache directory in bytes
+        """
+        self.storage = storage
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _cache_path(self, file_name: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(file_name.encode("utf-8")).hexdigest())
+
+    def _store(self, file_name: str, data: bytes):
+        if data is None or len(data) > self.max_bytes:
+            return
+
+        # Write to a temporary file first, so that readers never see a partial file
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            self._replace(temporary_path, self._cache_path(file_name), len(data))
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _replace(self, temporary_path: str, path: str, size: int):
+        # A file replaced, e.g. a blob overwritten or cached concurrently, no longer counts
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            self._size += size - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes may share the directory, so evict based on its actual content
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * DISK_CACHE_EVICTION_TARGET
+        for _, size, path in sorted(entries):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def write(self, file_name: str, data: bytes) -> str:
+        """
+        Write data to the underlying storage and keep a local copy of it.
+
+        :param file_name: Name of the file to create or update.
+        :param data: Data to write.
+
+        :return: URL of the blob in the underlying storage.
+        """
+        url = self.storage.write(file_name, data)
+        self._store(url, data)
+        return url
+
+    def read(self, file_name: str) -> bytes:
+        """
+        Read data from the local copy if it exists, otherwise from the underlying storage.
+
+        :param file_name: URL of the blob to read from.
+        :return: Data read as bytes.
+        """
+        path = self._cache_path(file_name)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # Mark the file as recently used
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            pass
+
+        data = self.storage.read(file_name)
+        self._store(file_name, data)
+        return data
+
+    def size(self, file_name: str) -> int:
+        try:
+            return os.path.getsize(self._cache_path(file_name))
+        except FileNotFoundError:
+            return self.storage.size(file_name)
+
+    def read_range(self, file_name: str, offset: int, length: int) -> bytes:
+        """
+        Read a byte range from the local copy if it exists, otherwise from the underlying storage, without copying the
+        file locally.
+
+        :param file_name: URL of the blob to read from.
+        :param offset: Position of the first byte to read.
+        :param length: Number of bytes to read.
+        :return: Data read as bytes.
+        """
+        try:
+            with open(self._cache_path(file_name), "rb") as file:
+                file.seek(offset)
+                return file.read(length)
+        except FileNotFoundError:
+            return self.storage.read_range(file_name, offset, length)
+
+    def iter_read(self, file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream data from the local copy if it exists, otherwise from the underlying storage while copying it locally.
+
+        :param file_name: URL of the blob to read from.
+        :param chunk_size: Maximum size of the chunks in bytes.
+        :return: Iterator over the chunks of data.
+        """
+        path = self._cache_path(file_name)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            file = None
+
+        if file is not None:
+            os.utime(path)
+            with file:
+                while chunk := file.read(chunk_size):
+                    yield chunk
+            return
+
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as temporary_file:
+                for chunk in self.storage.iter_read(file_name, chunk_size):
+                    temporary_file.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            if size > self.max_bytes:
+                os.remove(temporary_path)
+                return
+            self._replace(temporary_path, path, size)
+        except BaseException:
+            # Interrupted streams, e.g. a client disconnecting, leave no partial copy behind
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def delete(self, file_name: str):
+        """
+        Delete data from the underlying storage and its local copy.
+
+        :param file_name: URL of the blob to delete.
+        """
+        self.storage.delete(file_name)
+        try:
+            os.remove(self._cache_path(file_name))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        self.storage.close()
+
+    def local_path(self, file_name: str) -> Optional[str]:
+        path = self._cache_path(file_name)
+        if os.path.exists(path):
+            return path
+        return self.storage.local_path(file_name)
+
 
 if "AZURE_STORAGE_CONNECTION_STRING" in os.environ:
     storage_manager = AzureBlobManager(
@@ -116,3 +636,15 @@ if "AZURE_STORAGE_CONNECTION_STRING" in os.environ:
 
 else:
     storage_manager = FileStorageManager(os.environ["FILE_STORAGE_DIRECTORY"])
+
+if "BLOB_DISK_CACHE_DIRECTORY" in os.environ:
+    storage_manager = DiskCachedStorageManager(
+        storage_manager,
+        os.environ["BLOB_DISK_CACHE_DIRECTORY"],
+        int(os.environ.get("BLOB_DISK_CACHE_MAX_BYTES", 1024 * 1024 * 1024)),
+    )
+
+# Memory budget of the blob cache in bytes, 0 disables it
+_blob_cache_max_bytes = int(os.environ.get("BLOB_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+if _blob_cache_max_bytes > 0:
+    storage_manager.cache = BlobCache(_blob_cache_max_bytes)
@@ -1,14 +1,39 @@
+import logging
 from functools import lru_cache, partial
-from typing import Dict, List, Callable
+from typing import Any, Dict, Iterable, List, Callable, Set
 
-from sqlalchemy import Table, MetaData, inspect
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy import Table, MetaData, Index, inspect, text
+from sqlalchemy.exc import DBAPIError
 
 from .engine import engine
-from .table import load_simple_table_from_configuration
+from .table import load_simple_table_from_configuration, legacy_index_names
 from ..components import Component
 
+logger = logging.getLogger(__name__)
+
+# Tables prepared by `sync_db_from_configuration`, handed out without any reflection
+_synced_tables: Dict[str, Table] = {}
+
+
+def _run_ddl(create: Callable[[], None], exists: Callable[[], bool]):
+    """
+    Create database objects that another process may create at the same time, e.g. when several deployments start
+    together. The loser of the race gets an OperationalError on SQLite, a ProgrammingError or an IntegrityError on
+    Postgres, which is ignored once the objects are found to exist.
+
+    :param create: Function creating the objects
+    :param exists: Function checking that the objects exist
+    """
+    try:
+        create()
+    except DBAPIError:
+        if not exists():
+            raise
+
+
+def _index_exists(table_name: str, index_name: str) -> bool:
+    return any(index["name"] == index_name for index in inspect(engine).get_indexes(table_name))
+
 
 def get_or_create_table_with_provider(
         table_name: str,
@@ -23,20 +48,116 @@ def get_or_create_table_with_provider(
     :return: SQLAlchemy Table object
     """
     metadata = MetaData()
-    inspector = inspect(engine)
 
-    if table_name not in inspector.get_table_names():
+    if not inspect(engine).has_table(table_name):
         table = table_provider(metadata)
-        try:
-            metadata.create_all(engine)
-        except OperationalError:
-            pass
+        _run_ddl(
+            lambda: metadata.create_all(engine),
+            lambda: inspect(engine).has_table(table_name)
+            and all(_index_exists(table_name, index.name) for index in table.indexes),
+        )
     else:
         table = Table(table_name, metadata, autoload_with=engine)
+        definition = table_provider(MetaData())
+        _widen_columns(definition, {column.name: column.type for column in table.columns})
+        # Tables created by a previous version may lack some of the indexes of the provider
+        for index in definition.indexes:
+            _run_ddl(lambda: _create_index(index), lambda: _index_exists(table_name, index.name))
+        _drop_legacy_indexes(definition, {index.name for index in table.indexes})
 
     return table
 
 
+def _widen_columns(definition: Table, existing: Dict[str, Any]):
+    """
+    Widen the string columns of a table created by a previous version with a shorter length than in its definition,
+    e.g. the type column, too short for some content types.
+    SQLite does not enforce the length of strings, only Postgres tables are altered.
+
+    :param definition: The table as defined by its provider
+    :param existing: Types of the existing columns of the table
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    preparer = engine.dialect.identifier_preparer
+    with engine.connect() as connection:
+        for column in definition.columns:
+            length = getattr(column.type, "length", None)
+            current = getattr(existing.get(column.name), "length", None)
+            if length is None or current is None or current >= length:
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {preparer.format_table(definition)} "
+                f"ALTER COLUMN {preparer.quote(column.name)} TYPE VARCHAR({length})"
+            ))
+            logger.info(f"Widened {definition.name}.{column.name} from {current} to {length} characters")
+        connection.commit()
+
+
+def _create_index(index: Index):
+    """
+    Create a missing index of an existing table. On Postgres, the index is built concurrently, outside of a
+    transaction, so that the writes to the table are not blocked while it is built.
+
+    :param index: The index, as defined by the provider of the table
+    """
+    if engine.dialect.name != "postgresql":
+        index.create(engine, checkfirst=True)
+        return
+
+    index.dialect_kwargs["postgresql_concurrently"] = True
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            index.create(connection, checkfirst=True)
+    finally:
+        index.dialect_kwargs["postgresql_concurrently"] = False
+
+
+def _index_is_valid(table_name: str, index_name: str) -> bool:
+    """
+    Return whether an index exists and can be used. On Postgres, an index whose concurrent build failed, or is still
+    going on, exists but is invalid.
+    """
+    if engine.dialect.name != "postgresql":
+        return _index_exists(table_name, index_name)
+
+    with engine.connect() as connection:
+        return bool(connection.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": engine.dialect.identifier_preparer.quote(index_name)},
+        ).scalar())
+
+
+def _drop_legacy_indexes(definition: Table, index_names: Set[str]):
+    """
+    Drop the indexes of a table replaced since a previous version, see `legacy_index_names`, once the indexes
+    replacing them are valid. On Postgres, they are dropped concurrently, without blocking the table.
+
+    :param definition: The table as defined by its provider
+    :param index_names: Names of the existing indexes of the table
+    """
+    legacy = [name for name in legacy_index_names(definition.name) if name in index_names]
+    if not legacy:
+        return
+
+    invalid = [index.name for index in definition.indexes if not _index_is_valid(definition.name, index.name)]
+    if invalid:
+        logger.warning(
+            f"Kept the legacy indexes {', '.join(legacy)} of {definition.name}, as the indexes {', '.join(invalid)} "
+            f"are not valid yet. Indexes left invalid by a failed build must be dropped to be built again."
+        )
+        return
+
+    concurrently = " CONCURRENTLY" if engine.dialect.name == "postgresql" else ""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name in legacy:
+            connection.execute(
+                text(f"DROP INDEX{concurrently} IF EXISTS {engine.dialect.identifier_preparer.quote(name)}")
+            )
+            logger.info(f"Dropped index {name}")
+
+
 @lru_cache
 def get_or_create_standard_component_table(table_name: str) -> Table:
     """
@@ -45,6 +166,10 @@ def get_or_create_standard_component_table(table_name: str) -> Table:
     :param table_name: Table name
     :return: SQLAlchemy Table object
     """
+    table = _synced_tables.get(table_name)
+    if table is not None:
+        return table
+
     return get_or_create_table_with_provider(
         table_name=table_name,
         table_provider=partial(load_simple_table_from_configuration, table_name)
@@ -53,32 +178,62 @@ def get_or_create_standard_component_table(table_name: str) -> Table:
 
 def sync_db_from_configuration(
         components: List[Component],
+        names: Iterable[str] = (),
 ) -> Dict[str, Table]:
     """
-    Sync the database from the components' configuration.
+    Sync the database from the components' configuration, in a single pass at startup: the missing tables are
+    created, and the existing ones are checked for the columns and indexes of their definition, the missing indexes
+    being created.
+
+    The tables are then handed out by `get_or_create_standard_component_table` without any reflection, including in
+    the processes forked afterwards, e.g. the workers.
+
     :param components: The components to sync
+    :param names: Names of other tables to sync, e.g. the sources of harvesters run by another deployment
     :return: The tables
+    :raises ValueError: If an existing table lacks columns
     """
-
+    names = list(dict.fromkeys([component.get_configuration().name for component in components] + list(names)))
     metadata_obj = MetaData()
+    tables = {name: load_simple_table_from_configuration(name, metadata_obj) for name in names}
 
-    tables = {}
-    indexes = []
-    for component in components:
-        config = component.get_configuration()
-        tables[config.name] = load_simple_table_from_configuration(
-            config.name, metadata_obj
-        )
-        # create index on
-        indexes.append(
-            f"CREATE INDEX IF NOT EXISTS {component.name}_date_index ON {name} (date)"
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+
+    missing = [tables[name] for name in names if name not in existing]
+    if missing:
+        _run_ddl(
+            lambda: metadata_obj.create_all(engine, tables=missing, checkfirst=True),
+            lambda: all(
+                inspect(engine).has_table(table.name)
+                and all(_index_exists(table.name, index.name) for index in table.indexes)
+                for table in missing
+            ),
         )
-
-    metadata_obj.create_all(engine, checkfirst=True)
-
-    with engine.connect() as connection:
-        for index in indexes:
-            connection.execute(text(index))
-        connection.commit()
-
+        logger.info(f"Created tables {', '.join(table.name for table in missing)}")
+
+    present = [name for name in names if name in existing]
+    if present:
+        # One reflection query per kind of object for all the tables
+        columns = inspector.get_multi_columns(filter_names=present)
+        indexes = inspector.get_multi_indexes(filter_names=present)
+
+        for name in present:
+            found = {column["name"] for column in columns.get((None, name), [])}
+            lacking = [column.name for column in tables[name].columns if column.name not in found]
+            if lacking:
+                raise ValueError(f"Table {name} lacks the columns {', '.join(lacking)}")
+            _widen_columns(tables[name], {column["name"]: column["type"] for column in columns[(None, name)]})
+
+            # Tables created by a previous version may lack some of the indexes of the definition
+            found = {index["name"] for index in indexes.get((None, name), [])}
+            for index in tables[name].indexes:
+                if index.name not in found:
+                    _run_ddl(lambda: _create_index(index), lambda: _index_exists(name, index.name))
+                    logger.info(f"Created index {index.name}")
+            _drop_legacy_indexes(tables[name], found)
+
+    _synced_tables.update(tables)
+    # Drop the tables reflected before the sync
+    get_or_create_standard_component_table.cache_clear()
     return tables
@@ -1,3 +1,5 @@
+from typing import List
+
 from sqlalchemy import (
     Column,
     TIMESTAMP,
@@ -21,14 +23,59 @@ def load_simple_table_from_configuration(table_name: str, metadata_obj: MetaData
     @param metadata_obj: The metadata object
     @return: The table
     """
-    return Table(
+    table = Table(
         table_name,
         metadata_obj,
         Column("id", INTEGER, primary_key=True, autoincrement=True),
         Column("date", TIMESTAMP, nullable=False),
         Column("data", VARCHAR(512), nullable=True),
-        Column("type", VARCHAR(24), nullable=True),
+        Column("type", VARCHAR(128), nullable=True),
         Column("hash", VARCHAR(32), nullable=True),
         Column("copy_id", INTEGER, nullable=True),
-        Index(f"${table_name}_date_index", "date"),
+    )
+    # Serves the latest rows and the ranges, ordered by date and id as the range pages. On Postgres, the other columns
+    # are included so that the rows are read from the index only.
+    Index(
+        f"{table_name}_date_index",
+        table.c.date.desc(),
+        table.c.id.desc(),
+        postgresql_include=["data", "type", "hash", "copy_id"],
+    )
+    # Lookups of the rows holding a hash, when deduplicating writes
+    Index(f"{table_name}_hash_index", table.c.hash)
+    # Lookups of the copies of a row
+    Index(f"{table_name}_copy_id_index", table.c.copy_id)
+    return table
+
+
+def legacy_index_names(table_name: str) -> List[str]:
+    """
+    Return the names of the indexes created by previous versions of `load_simple_table_from_configuration` and since
+    replaced, which are dropped when the table is synced.
+
+    @param table_name: The table name
+    @return: The index names
+    """
+    return [f"${table_name}_date_index"]
+
+
+def load_compacted_ranges_table(table_name: str, metadata_obj: MetaData):
+    """
+    Load/Create the table recording the time windows of the components compacted into Parquet files.
+
+    @param table_name: The table name
+    @param metadata_obj: The metadata object
+    @return: The table
+    """
+    return Table(
+        table_name,
+        metadata_obj,
+        Column("id", INTEGER, primary_key=True, autoincrement=True),
+        Column("component", VARCHAR(256), nullable=False),
+        Column("start_date", TIMESTAMP, nullable=False),
+        Column("end_date", TIMESTAMP, nullable=False),
+        Column("data", VARCHAR(512), nullable=True),
+        Column("rows", INTEGER, nullable=False),
+        Column("size", INTEGER, nullable=False),
+        Index(f"{table_name}_component_index", "component", "start_date", unique=True),
     )
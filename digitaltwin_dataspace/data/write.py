@@ -1,50 +1,286 @@
 import hashlib
 import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
 
-from sqlalchemy import Table
+from sqlalchemy import Table, select, func
 
+from .columnar import COLUMNAR_CONTENT_TYPES, serialize
 from .engine import engine
+from .notify import publish_new_row, published_new_row
 from .storage import storage_manager
 
+logger = logging.getLogger(__name__)
+
+# Time in milliseconds the group commit writer waits for other writes to join a transaction,
+# 0 to commit each `write_result` on its own
+GROUP_COMMIT_DELAY = float(os.environ.get("GROUP_COMMIT_DELAY", 0))
+# Maximum number of rows committed by the group commit writer in a single transaction
+GROUP_COMMIT_MAX_ROWS = int(os.environ.get("GROUP_COMMIT_MAX_ROWS", 500))
+
+# Maximum number of hashes looked up by a single deduplication query
+_HASH_QUERY_SIZE = 500
+
+
+def _to_bytes(content_type: str, data) -> Optional[bytes]:
+    if content_type in COLUMNAR_CONTENT_TYPES and data is not None and not isinstance(data, bytes):
+        return serialize(data, content_type)
+    elif isinstance(data, str):
+        return data.encode("utf-8")
+    elif isinstance(data, dict) or isinstance(data, list):
+        return json.dumps(data).encode("utf-8")
+    return data
+
+
+@dataclass
+class _Batch:
+    """Rows of a component written in a single transaction."""
+    name: str
+    content_type: str
+    table: Table
+    # Data, hash and date of each row
+    rows: List[Tuple[Optional[bytes], Optional[str], datetime]]
+    deduplicate: bool
+
+
+def _prepare(
+        name: str, content_type: str, table: Table, results: Iterable[Tuple[Any, datetime]], deduplicate: bool
+) -> _Batch:
+    rows = []
+    for data, date in results:
+        data_bytes = _to_bytes(content_type, data)
+        md5_digest = None if data_bytes is None else hashlib.md5(data_bytes).hexdigest()
+        rows.append((data_bytes, md5_digest, date))
+    return _Batch(name, content_type, table, rows, deduplicate)
+
+
+def _latest_ids_by_hash(connection, table: Table, hashes: List[str]) -> dict:
+    """Return the id of the latest row holding the data of each hash, for the hashes already stored."""
+    ids = {}
+    for offset in range(0, len(hashes), _HASH_QUERY_SIZE):
+        ids.update(connection.execute(
+            select(table.c.hash, func.max(table.c.id))
+            .where(table.c.hash.in_(hashes[offset:offset + _HASH_QUERY_SIZE]))
+            .where(table.c.copy_id.is_(None))
+            .group_by(table.c.hash)
+        ).fetchall())
+    return ids
+
+
+def _write_batches(batches: List[_Batch]):
+    """
+    Write batches of rows in a single transaction: the new blobs are uploaded concurrently, then the rows of each
+    batch are inserted with a multi-row INSERT and the transaction is committed once.
+    """
+    with engine.connect() as connection:
+        copies = []
+        for batch in batches:
+            existing = {}
+            if batch.deduplicate:
+                existing = _latest_ids_by_hash(
+                    connection, batch.table, list({md5 for _, md5, _ in batch.rows if md5 is not None})
+                )
+
+            # The first row of each new hash owns the blob, the other rows point to a row holding it
+            owners, file_names, contents, batch_copies, owned = [], [], [], [], set()
+            for data_bytes, md5_digest, date in batch.rows:
+                if batch.deduplicate and md5_digest is not None and (md5_digest in existing or md5_digest in owned):
+                    batch_copies.append({"date": date, "type": batch.content_type, "hash": md5_digest})
+                    continue
+                owned.add(md5_digest)
+                owners.append({"date": date, "data": None, "hash": md5_digest, "type": batch.content_type})
+                if data_bytes is not None:
+                    file_names.append(f"{batch.name}/{date.strftime('%Y-%m-%d_%H-%M-%S')}")
+                    contents.append((len(owners) - 1, data_bytes))
+
+            # Upload data to storage, rows without data only record the date
+            urls = storage_manager.write_many(file_names, [content for _, content in contents])
+            for (index, _), url in zip(contents, urls):
+                owners[index]["data"] = url
+
+            if owners:
+                connection.execute(batch.table.insert(), owners)
+            copies.append((batch, existing, batch_copies))
+
+        for batch, existing, batch_copies in copies:
+            if not batch_copies:
+                continue
+            # Rows whose data was uploaded by this batch point to the rows just inserted
+            missing = list({row["hash"] for row in batch_copies if row["hash"] not in existing})
+            if missing:
+                existing.update(_latest_ids_by_hash(connection, batch.table, missing))
+            connection.execute(
+                batch.table.insert(),
+                [
+                    {"date": row["date"], "type": row["type"], "copy_id": existing[row["hash"]]}
+                    for row in batch_copies
+                ],
+            )
+
+        names = list(dict.fromkeys(batch.name for batch in batches if batch.rows))
+        for name in names:
+            publish_new_row(connection, name)
+        connection.commit()
+
+    for name in names:
+        published_new_row(name)
+
+
+class GroupCommitWriter:
+    """
+    Background writer coalescing the writes of the components of a process, e.g. collectors running in threads,
+    into a single transaction, so that many small writes pay for one commit instead of one each.
+
+    A write waits up to `delay` milliseconds for other writes to join its transaction. If the transaction fails, its
+    writes are retried one by one so that a failing write does not fail the others.
+    """
+
+    def __init__(self, delay: float = GROUP_COMMIT_DELAY, max_rows: int = GROUP_COMMIT_MAX_ROWS):
+        """
+        :param delay: Time in milliseconds a write waits for other writes to join its transaction
+        :param max_rows: Maximum number of rows committed in a single transaction
+        """
+        self.delay = delay
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[Tuple[_Batch, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch: _Batch) -> Future:
+        """
+        Queue a batch of rows to write.
+
+        :return: Future resolved once the rows are committed
+        """
+        future = Future()
+        self._queue.put((batch, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            rows = len(pending[0][0].rows)
+            deadline = time.monotonic() + self.delay / 1000
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                rows += len(pending[-1][0].rows)
+            self._commit(pending)
+
+    def _commit(self, pending: List[Tuple[_Batch, Future]]):
+        try:
+            _write_batches([batch for batch, _ in pending])
+        except Exception as e:
+            if len(pending) > 1:
+                logger.warning(f"Group commit of {len(pending)} writes failed, retrying them one by one: {e}")
+                for item in pending:
+                    self._commit([item])
+            else:
+                pending[0][1].set_exception(e)
+            return
+
+        for _, future in pending:
+            future.set_result(None)
+
+
+# Group commit writer of the current process, started on the first write
+_writer: Optional[GroupCommitWriter] = None
+_writer_pid: Optional[int] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> GroupCommitWriter:
+    global _writer, _writer_pid
+    with _writer_lock:
+        # The thread of the writer does not survive a fork
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = GroupCommitWriter()
+            _writer_pid = os.getpid()
+        return _writer
+
 
 def write_result(
-        name: str, content_type: str, table: Table, data, date: datetime
+        name: str, content_type: str, table: Table, data, date: datetime, deduplicate: bool = True
 ):
     """
     Write the result of a harvester to the database.
     If the data already exists, it will be overwritten.
+    If a row with the same hash already exists, only a row pointing to it through the copy_id column is inserted,
+    and the data is not uploaded to the storage again.
     :param name:  The name of the folder to write to in the storage
     :param content_type:  The content type of the data (e.g., "text", "json", etc.)
     :param table:  The table to write to
-    :param data:  The data to write
+    :param data:  The data to write, tabular data (Arrow table, DataFrame, records) is serialized for columnar
+        content types
     :param date:  The date of the data
-    """
+    :param deduplicate:  Whether to look for an existing row with the same hash
 
-    if data is str:
-        data_bytes = data.encode("utf-8")
-    elif isinstance(data, dict) or isinstance(data, list):
-        data_bytes = json.dumps(data).encode("utf-8")
+    Once committed, the new row is notified to the harvesters listening to the component.
+    When GROUP_COMMIT_DELAY is set, the row is committed by the group commit writer of the process together with the
+    other writes of the process, and this function returns once it is committed.
+    """
+    batch = _prepare(name, content_type, table, [(data, date)], deduplicate)
+    if GROUP_COMMIT_DELAY > 0:
+        _get_writer().submit(batch).result()
     else:
-        data_bytes = data
+        _write_batches([batch])
 
-    if data_bytes is None:
-        md5_digest = None
-    else:
-        md5_digest = hashlib.md5(data_bytes).hexdigest()
 
+def write_results(
+        name: str, content_type: str, table: Table, results: Iterable[Tuple[Any, datetime]], deduplicate: bool = True
+):
+    """
+    Write several results of a component at once, e.g. the items of a harvester with multiple results or a backfill.
+    The new blobs are uploaded concurrently, and all the rows are inserted in a single transaction, see
+    `write_result` for the handling of each row.
+    :param name:  The name of the folder to write to in the storage
+    :param content_type:  The content type of the data
+    :param table:  The table to write to
+    :param results:  The data and date of each row
+    :param deduplicate:  Whether to look for existing rows with the same hash
+    """
+    batch = _prepare(name, content_type, table, results, deduplicate)
+    if batch.rows:
+        _write_batches([batch])
+
+
+def write_copy_of_latest(name: str, table: Table, date: datetime) -> bool:
+    """
+    Write a row pointing to the latest row with data through the copy_id column, e.g. when the content collected
+    did not change. Nothing is uploaded to the storage.
+    :param name:  The name of the component
+    :param table:  The table to write to
+    :param date:  The date of the new row
+    :return: Whether a row was written, False if the table has no row with data yet
+    """
     with engine.connect() as connection:
+        latest = connection.execute(
+            select(table.c.id, table.c.type, table.c.copy_id)
+            .where((table.c.copy_id.isnot(None)) | (table.c.hash.isnot(None)))
+            .order_by(table.c.date.desc())
+            .limit(1)
+        ).fetchone()
+
+        if latest is None:
+            return False
 
-        # Upload data to storage
-        url = storage_manager.write(
-            f"{name}/{date.strftime('%Y-%m-%d_%H-%M-%S')}",
-            data_bytes,
-        )
-        # Insert data to database
         connection.execute(
-            table.insert().values(
-                date=date, data=url, hash=md5_digest, type=content_type
-            )
+            table.insert().values(date=date, type=latest.type, copy_id=latest.copy_id or latest.id)
         )
-
+        publish_new_row(connection, name)
         connection.commit()
+
+    published_new_row(name)
+    return True
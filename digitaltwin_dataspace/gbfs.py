@@ -0,0 +1,151 @@
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from .client import shared_client
+from .components.base import ComponentConfiguration
+from .components.collector import AsyncCollector, NOT_MODIFIED
+from .data.columnar import COLUMNAR_CONTENT_TYPES, points_to_table
+from .geojson import points_to_geojson
+
+logger = logging.getLogger(__name__)
+
+# Name suffix, tag and description of the well-known feeds, other feeds use their own name
+_FEEDS = {
+    "free_bike_status": ("vehicle_position", "position", "vehicle positions"),
+    "vehicle_status": ("vehicle_position", "position", "vehicle positions"),
+    "geofencing_zones": ("geofences", "fences", "geofences data"),
+}
+
+# Feeds listing vehicles, and the key of the list in their data
+_VEHICLE_FEEDS = {"free_bike_status": "bikes", "vehicle_status": "vehicles"}
+
+
+class GBFSCollector(AsyncCollector):
+    """
+    Collector of one feed of a GBFS (General Bikeshare Feed Specification) system.
+
+    Vehicle feeds (free_bike_status, vehicle_status) are stored as GeoJSON points, geofencing zones as their GeoJSON
+    feature collection, and the other feeds as published. Vehicle feeds can be stored as Arrow IPC or (Geo)Parquet
+    instead, see `digitaltwin_dataspace.data.columnar`. Feeds are polled with conditional requests, honoring their
+    ttl. Use `discover` to create the collectors of all the feeds of a system from its gbfs.json discovery URL.
+    """
+
+    def __init__(
+            self,
+            operator: str,
+            feed: str,
+            url: str,
+            schedule: str = "10s",
+            content_type: str = "application/json",
+    ):
+        """
+        :param operator: Name of the operator, e.g. "dott", used to name the component
+        :param feed: Name of the GBFS feed, e.g. "free_bike_status"
+        :param url: URL of the feed
+        :param schedule: Schedule of the collector
+        :param content_type: Content type of the vehicle feeds, the other feeds are always stored as JSON
+        """
+        self.operator = operator
+        self.feed = feed
+        self.url = url
+        self.schedule = schedule
+        self.content_type = content_type if feed in _VEHICLE_FEEDS else "application/json"
+
+    @classmethod
+    def discover(
+            cls,
+            operator: str,
+            discovery_url: str,
+            feeds: Optional[List[str]] = None,
+            language: str = "en",
+            schedule: str = "10s",
+            content_type: str = "application/json",
+            fallback: Optional[Dict[str, str]] = None,
+            retries: int = 3,
+            backoff: float = 1.0,
+    ) -> List["GBFSCollector"]:
+        """
+        Create one collector per feed listed by the gbfs.json discovery file of a system.
+
+        :param operator: Name of the operator, e.g. "dott", used to name the components
+        :param discovery_url: URL of the gbfs.json discovery file
+        :param feeds: Names of the feeds to collect, defaults to all the feeds but the discovery file itself
+        :param language: Language of the feeds, for GBFS versions publishing feeds per language
+        :param schedule: Schedule of the collectors
+        :param content_type: Content type of the vehicle feeds
+        :param fallback: URLs of the feeds by name, used when the discovery file cannot be fetched
+        :param retries: Number of retries of the discovery file
+        :param backoff: Delay in seconds before the first retry, doubled on each retry
+        :return: The collectors
+        :raises Exception: If the discovery file cannot be fetched and there is no fallback
+        """
+
+        async def fetch():
+            response = await shared_client.client.get(discovery_url)
+            return response.raise_for_status().json()
+
+        for attempt in range(retries + 1):
+            try:
+                data = shared_client.run(fetch())["data"]
+                break
+            except Exception as e:
+                if attempt < retries:
+                    logger.warning(f"Failed to fetch {discovery_url}, retrying in {backoff * 2 ** attempt}s: {e}")
+                    time.sleep(backoff * 2 ** attempt)
+                elif fallback is not None:
+                    logger.warning(f"Failed to fetch {discovery_url}, using the fallback feed URLs: {e}")
+                    return [
+                        cls(operator, feed, url, schedule, content_type)
+                        for feed, url in fallback.items()
+                        if feeds is None or feed in feeds
+                    ]
+                else:
+                    raise
+
+        # GBFS 3 lists the feeds directly, previous versions per language
+        if "feeds" not in data:
+            data = data.get(language) or next(iter(data.values()))
+
+        return [
+            cls(operator, feed["name"], feed["url"], schedule, content_type)
+            for feed in data["feeds"]
+            if feed["name"] != "gbfs" and (feeds is None or feed["name"] in feeds)
+        ]
+
+    def get_schedule(self) -> str:
+        return self.schedule
+
+    def get_configuration(self) -> ComponentConfiguration:
+        suffix, tag, description = _FEEDS.get(self.feed, (self.feed, self.feed, f"{self.feed} data"))
+        return ComponentConfiguration(
+            name=f"{self.operator}_{suffix}_collector",
+            tags=[self.operator.capitalize(), tag],
+            description=f"Collects {description} from {self.operator.capitalize()} APIs",
+            content_type=self.content_type,
+        )
+
+    async def acollect(self) -> bytes:
+        response = await self.conditional_get(self.url)
+        if response is None:
+            return NOT_MODIFIED
+
+        try:
+            response_json = response.json()
+        except json.JSONDecodeError:
+            raise ValueError(f"{self.operator} {self.feed} is not available, returned {response.text[:200]}")
+
+        # GBFS feeds tell how long their content stays valid
+        self.set_fresh_for(self.url, response_json.get("ttl"))
+
+        data = response_json["data"]
+        if self.feed in _VEHICLE_FEEDS:
+            vehicles = data[_VEHICLE_FEEDS[self.feed]]
+            if self.content_type in COLUMNAR_CONTENT_TYPES:
+                # Serialized by `write_result`
+                return points_to_table(vehicles)
+            return points_to_geojson(vehicles)
+        if self.feed == "geofencing_zones":
+            return json.dumps(data["geofencing_zones"]).encode("utf-8")
+        return response.content
@@ -0,0 +1,59 @@
+import json
+from typing import Any, Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _flatten(record: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    # Same layout as pandas.json_normalize: nested objects become "parent.child" keys placed after the flat keys
+    flat, nested = {}, {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            nested.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    flat.update(nested)
+    return flat
+
+
+def points_to_geojson(records: Iterable[Dict[str, Any]], lon_key: str = "lon", lat_key: str = "lat") -> bytes:
+    """
+    Convert records holding a longitude and a latitude, e.g. the bikes of a GBFS free_bike_status feed, to a GeoJSON
+    FeatureCollection of points.
+
+    The output has the layout of `GeoDataFrame.to_json()` applied to `pandas.json_normalize(records)`: nested objects
+    are flattened, every feature has every property (null when missing), and the coordinates are removed from the
+    properties. It is built straight from the records, without pandas or shapely.
+
+    :param records: The records
+    :param lon_key: The key of the longitude
+    :param lat_key: The key of the latitude
+    :return: The GeoJSON, encoded as UTF-8
+    """
+    rows: List[Dict[str, Any]] = [_flatten(record) for record in records]
+
+    # Union of the properties, in order of appearance
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    columns = [column for column in columns if column not in (lon_key, lat_key)]
+
+    features = [
+        {
+            "id": str(index),
+            "type": "Feature",
+            "properties": {column: row.get(column) for column in columns},
+            "geometry": {"type": "Point", "coordinates": [row[lon_key], row[lat_key]]},
+        }
+        for index, row in enumerate(rows)
+    ]
+
+    return dumps({"type": "FeatureCollection", "features": features})
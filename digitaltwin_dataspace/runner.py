@@ -1,14 +1,30 @@
+import asyncio
 import logging
+import os
+import socket
 import time
+from concurrent.futures import CancelledError
+from contextlib import asynccontextmanager
 from multiprocessing import Process
-from typing import List
+from typing import List, Optional, Dict, Set
 
 import fastapi
 import schedule
 import uvicorn
 
+from .client import shared_client
 from .components.base import Component, ScheduleRunnable, Servable
+from .components.collector import Collector
+from .components.compactor import Compactor
+from .components.harvester import Harvester
+from .dag import ComponentGraph
+from .data.engine import engine
+from .data.latest import LatestCache, set_latest_cache
+from .data.notify import NewRowChannel, set_channel
+from .data.storage import storage_manager
+from .data.sync_db import sync_db_from_configuration
 from .utils import schedule_string_to_function
+from .workers import WorkerPool
 
 # Setup logging
 logging.basicConfig(
@@ -17,25 +33,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Address of the HTTP server serving the endpoints of the components
+SERVER_HOST = os.environ.get("SERVER_HOST", "localhost")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 8080))
+# Number of processes of the HTTP server
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 1))
 
-def _in_process(func):
-    def wrapper(*args, **kwargs):
+
+@asynccontextmanager
+async def _lifespan(app: fastapi.FastAPI):
+    # Open the database connection of the serving process before the first request
+    await asyncio.to_thread(lambda: engine.connect().close())
+    yield
+    # Release the connections of the serving process
+    await asyncio.to_thread(shared_client.close)
+    await asyncio.to_thread(storage_manager.close)
+    await asyncio.to_thread(engine.dispose)
+
+
+def _serve(app: fastapi.FastAPI, host: str, port: int, workers: int):
+    """
+    Serve the app from `workers` processes accepting the connections of a single listening socket, so that requests
+    are spread across cores. The processes are forked, and share the state set up before, e.g. the latest row cache.
+
+    If the socket cannot be bound, e.g. when the port is taken, the error is logged and the components keep running
+    on their schedule without being served.
+    """
+    config = uvicorn.Config(app, host=host, port=port, log_level="critical")
+    try:
+        listener = config.bind_socket()
+    except (OSError, SystemExit) as e:
+        # uvicorn exits when binding fails, which must not stop the scheduler
+        logger.exception(f"Failed to bind FastAPI app to {host}:{port}, the components are not served", exc_info=e)
+        return
+    if listener.family in (socket.AF_INET, socket.AF_INET6):
+        # Inherited by the accepted connections, which would otherwise wait for delayed ACKs on keep-alive requests
+        listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def run_server():
+        try:
+            uvicorn.Server(config).run(sockets=[listener])
+        except Exception as e:
+            logger.exception("Failed to start FastAPI app", exc_info=e)
+
+    logger.info(f"Starting FastAPI app on http://{host}:{port} with {workers} worker(s)")
+    for _ in range(workers):
+        Process(target=run_server, daemon=True).start()
+
+
+def _dispatch(pool: WorkerPool, name: str):
+    def wrapper():
         try:
-            process = Process(target=func, args=args, kwargs=kwargs)
-            process.start()
-            logger.debug(f"Started process for {func.__name__} with PID {process.pid}")
+            pool.submit(name)
+            logger.debug(f"Submitted run of {name}")
         except Exception as e:
-            logger.exception(f"Failed to start process for {func.__name__}: {e}")
+            logger.exception(f"Failed to submit run of {name}: {e}")
 
     return wrapper
 
 
-def run_components(components: List[Component]):
+def _on_new_row(pool: WorkerPool, triggers: Dict[str, Set[str]], latest_cache: LatestCache):
+    def wrapper(name: str):
+        latest_cache.invalidate(name)
+        for triggered in triggers.get(name, ()):
+            pool.submit(triggered, queue_if_busy=True)
+            logger.debug(f"New row of {name}, triggered {triggered}")
+
+    return wrapper
+
+
+def _run_in_order(pool: WorkerPool, graph: ComponentGraph, names: Set[str]):
+    """Run the given components once, level by level, each level in parallel once the previous one is over."""
+    for level in graph.levels():
+        # Runs queued behind a running one get a future too, the next level waits for them
+        futures = {name: pool.submit(name, queue_if_busy=True) for name in level if name in names}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except CancelledError:
+                logger.warning(f"Initial run of {name} was cancelled")
+            except Exception as e:
+                logger.exception(f"Initial run of {name} failed: {e}")
+
+
+def _report_overruns(pool: WorkerPool):
+    # Counters at the previous report, only the overruns since then are reported
+    reported: Dict[str, Dict[str, int]] = {}
+
+    def wrapper():
+        for name, statistics in pool.get_statistics().items():
+            previous = reported.get(name, {})
+            delta = {key: value - previous.get(key, 0) for key, value in statistics.items()}
+            reported[name] = dict(statistics)
+            if delta["overrun"]:
+                logger.warning(
+                    f"{name} overran its schedule {delta['overrun']} times since the last report "
+                    f"(skipped: {delta['skipped']}, queued: {delta['queued']})"
+                )
+
+    return wrapper
+
+
+def run_components(
+        components: List[Component],
+        process_workers: Optional[int] = None,
+        thread_workers: Optional[int] = None,
+        init_dependencies: bool = False,
+        parquetize: Optional[List[str]] = None,
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        server_workers: int = SERVER_WORKERS,
+):
+    """
+    Schedule and serve the given components.
+
+    Components run on their schedule, and as soon as the components they read from commit new rows: a chain
+    collector -> harvester -> harvester is traversed without waiting for the schedule of each hop, and independent
+    branches run in parallel on the workers.
+
+    :param components: The components to run
+    :param process_workers: Number of long-lived worker processes running the scheduled components,
+        defaults to the number of runs they may have at the same time
+    :param thread_workers: Number of worker threads running the scheduled components whose execution mode is "thread"
+    :param init_dependencies: Run all the scheduled components once in dependency order before starting the scheduler
+    :param parquetize: Names of the components whose closed windows are compacted into Parquet files, see `Compactor`
+    :param host: Host of the HTTP server
+    :param port: Port of the HTTP server
+    :param server_workers: Number of processes of the HTTP server
+    :raises CycleError: If the components depend on each other in a cycle
+    """
+    if parquetize:
+        components = components + [Compactor(parquetize)]
+
+    graph = ComponentGraph(components)
+    for name in sorted(graph.external()):
+        logger.warning(f"{name} is referenced as source or dependency but is not run here, it will only be polled")
+
+    # Create or check all the tables once, the processes forked below then use them without reflection
+    sync_db_from_configuration(
+        [component for component in components if isinstance(component, (Collector, Harvester))],
+        sorted(graph.external()),
+    )
+
     app = fastapi.FastAPI(
         redoc_url="/docs",
         docs_url=None,
+        lifespan=_lifespan,
+    )
+
+    channel = NewRowChannel()
+    set_channel(channel)
+
+    scheduled = [component for component in components if isinstance(component, ScheduleRunnable)]
+    pool = WorkerPool(
+        scheduled,
+        process_workers=process_workers,
+        thread_workers=thread_workers,
+        channel=channel,
     )
 
+    # Shared with the serving process, forked below
+    latest_cache = LatestCache(graph.names)
+    set_latest_cache(latest_cache)
+
+    # Run components as soon as the components they listen to commit new rows, and refresh their latest row
+    channel.listen(_on_new_row(pool, graph.triggers, latest_cache))
+
+    if init_dependencies:
+        logger.info("Running components in dependency order")
+        _run_in_order(pool, graph, {component.get_configuration().name for component in scheduled})
+
     for component in components:
         configuration = component.get_configuration()
         logger.info(f"Registering component: {configuration.name}")
@@ -43,7 +210,7 @@ def run_components(components: List[Component]):
         if isinstance(component, ScheduleRunnable):
             try:
                 job = schedule_string_to_function(component.get_schedule())
-                job.do(_in_process(component.run))
+                job.do(_dispatch(pool, configuration.name))
                 logger.info(f"Scheduled {configuration.name} with {component.get_schedule()}")
             except Exception as e:
                 logger.exception(f"Failed to schedule {configuration.name}: {e}")
@@ -66,19 +233,17 @@ def run_components(components: List[Component]):
             except Exception as e:
                 logger.exception(f"Failed to register endpoints for {configuration.name}: {e}")
 
-    def run_app():
-        try:
-            logger.info("Starting FastAPI app on http://localhost:8080")
-            uvicorn.run(app, host="localhost", port=8080,log_level="critical")
-        except Exception as e:
-            logger.exception("Failed to start FastAPI app", exc_info=e)
+    schedule.every(1).minutes.do(_report_overruns(pool))
 
-    Process(target=run_app).start()
+    _serve(app, host, port, server_workers)
 
     logger.info("Scheduler started")
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(1)
-        except Exception as e:
-            logger.exception("Error during scheduler run", exc_info=e)
\ No newline at end of file
+    try:
+        while True:
+            try:
+                schedule.run_pending()
+                time.sleep(1)
+            except Exception as e:
+                logger.exception("Error during scheduler run", exc_info=e)
+    finally:
+        pool.shutdown(wait=False)
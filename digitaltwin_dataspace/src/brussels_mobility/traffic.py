@@ -1,18 +1,13 @@
 import json
 
-import os
 import dotenv
-import requests
-import pandas as pd
-import geopandas as gpd
-import shapely
 
 dotenv.load_dotenv()
 
-from digitaltwin_dataspace import run_components, Collector, ComponentConfiguration
+from digitaltwin_dataspace import run_components, AsyncCollector, ComponentConfiguration, NOT_MODIFIED
 
 
-class BrusselsMobilityTrafficDevicesCollector(Collector):
+class BrusselsMobilityTrafficDevicesCollector(AsyncCollector):
     def get_schedule(self) -> str:
         return "10s"
 
@@ -24,14 +19,15 @@ class BrusselsMobilityTrafficDevicesCollector(Collector):
             content_type="application/json",
         )
 
-    def collect(self) -> bytes:
-        data = requests.get(
-            "https://data.mobility.brussels/traffic/api/counts/?request=devices"
-        ).json()
+    async def acollect(self) -> bytes:
+        response = await self.conditional_get("https://data.mobility.brussels/traffic/api/counts/?request=devices")
+        if response is None:
+            return NOT_MODIFIED
+        data = response.json()
         return json.dumps(data).encode("utf-8")
 
 
-class BrusselsMobilityTrafficCountsCollector(Collector):
+class BrusselsMobilityTrafficCountsCollector(AsyncCollector):
     def get_schedule(self) -> str:
         return "10s"
 
@@ -43,10 +39,11 @@ class BrusselsMobilityTrafficCountsCollector(Collector):
             content_type="application/json",
         )
 
-    def collect(self) -> bytes:
-        data = requests.get(
-            "https://data.mobility.brussels/traffic/api/counts/?request=live"
-        ).json()
+    async def acollect(self) -> bytes:
+        response = await self.conditional_get("https://data.mobility.brussels/traffic/api/counts/?request=live")
+        if response is None:
+            return NOT_MODIFIED
+        data = response.json()
         return json.dumps(data).encode("utf-8")
 
 
@@ -1,71 +1,15 @@
-import json
-
-import os
 import dotenv
-import requests
-import pandas as pd
-import geopandas as gpd
-import shapely
 
 dotenv.load_dotenv()
 
-from digitaltwin_dataspace import run_components, Collector, ComponentConfiguration
-
-
-class PonyVehiclePositionCollector(Collector):
-    def get_schedule(self) -> str:
-        return "10s"
-
-    def get_configuration(self) -> ComponentConfiguration:
-        return ComponentConfiguration(
-            name="pony_vehicle_position_collector",
-            tags=["Pony", "position"],
-            description="Collects vehicle positions from Pony APIs",
-            content_type="application/json",
-        )
-
-    def collect(self) -> bytes:
-        endpoint = "https://gbfs.getapony.com/v1/Brussels/en/free_bike_status.json"
-        response = requests.get(endpoint)
-        try:
-            response_json = response.json()
-            response_df = pd.json_normalize(response_json["data"]["bikes"])
-            response_gdf = gpd.GeoDataFrame(
-            response_df,
-            crs="epsg:4326",
-            geometry=[
-                shapely.geometry.Point(xy)
-                for xy in zip(response_df["lon"], response_df["lat"])
-            ],
-            )
-            # Drop lat and lon columns
-            response_gdf = response_gdf.drop(columns=["lat", "lon"])
-
-            return response_gdf.to_json().encode("utf-8")
-        except json.JSONDecodeError:
-            raise Exception("Pony API is not available, returned " + response.text)
-
-
-class PonyGeofencesCollector(Collector):
-    def get_schedule(self) -> str:
-        return "10s"
-
-    def get_configuration(self) -> ComponentConfiguration:
-        return ComponentConfiguration(
-            name="pony_geofences_collector",
-            tags=["Pony", "fences"],
-            description="Collects geofences data from Pony APIs",
-            content_type="application/json",
-        )
+from digitaltwin_dataspace import run_components
+from digitaltwin_dataspace.gbfs import GBFSCollector
 
-    def collect(self) -> bytes:
-        endpoint = "https://gbfs.getapony.com/v1/Brussels/en/geofencing_zones.json"
-        response_json = requests.get(endpoint).json()
-        return json.dumps(response_json["data"]["geofencing_zones"]).encode("utf-8")
+FEEDS = {
+    "free_bike_status": "https://gbfs.getapony.com/v1/Brussels/en/free_bike_status.json",
+    "geofencing_zones": "https://gbfs.getapony.com/v1/Brussels/en/geofencing_zones.json",
+}
 
 
 if __name__ == "__main__":
-    run_components([
-        PonyVehiclePositionCollector(),
-        PonyGeofencesCollector()
-    ])
\ No newline at end of file
+    run_components([GBFSCollector("pony", feed, url) for feed, url in FEEDS.items()])
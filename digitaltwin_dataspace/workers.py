@@ -0,0 +1,215 @@
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from .components.base import ScheduleRunnable
+from .data.notify import NewRowChannel, set_channel
+
+logger = logging.getLogger(__name__)
+
+# Components available inside a worker process, populated once by the pool initializer
+_worker_components: Dict[str, ScheduleRunnable] = {}
+
+
+def _initialize_worker(components: List[ScheduleRunnable], channel: Optional[NewRowChannel]):
+    """
+    Initialize a long-lived worker process.
+
+    The components are registered once per worker, so only their names travel with each job. The engine drops the
+    connections inherited from the parent process by itself after a fork.
+    """
+    set_channel(channel)
+
+    for component in components:
+        _worker_components[component.get_configuration().name] = component
+
+
+def _run_in_worker(name: str):
+    return _worker_components[name].run()
+
+
+def _transfer(source: Future, target: Future):
+    """Resolve a future with the outcome of another one."""
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+@dataclass
+class RunStatistics:
+    """Counters of the scheduled runs of a component."""
+    started: int = 0
+    completed: int = 0
+    failed: int = 0
+    # Ticks that fired while the maximum number of runs of the component were still going
+    overrun: int = 0
+    # Overrun ticks deferred until a run is over
+    queued: int = 0
+    # Overrun ticks dropped
+    skipped: int = 0
+
+
+class _RunState:
+    def __init__(self, component: ScheduleRunnable):
+        self.policy = component.get_overlap_policy()
+        self.limit = component.get_max_concurrent_runs() if self.policy == "concurrent" else 1
+        self.running = 0
+        # Future of the queued run, resolved once it is over
+        self.pending: Optional[Future] = None
+        self.statistics = RunStatistics()
+
+
+class WorkerPool:
+    """
+    Run the jobs of scheduled components on long-lived workers instead of forking a process per tick.
+
+    Components are dispatched either to a pool of worker processes or to a pool of threads living in the scheduler
+    process, depending on `ScheduleRunnable.get_execution_mode()`. Workers are reused between ticks, which keeps the
+    database engine, the table cache and the storage client warm.
+
+    Runs of the same component never pile up: when a tick fires while the component is busy, it is skipped, queued or
+    run concurrently according to `ScheduleRunnable.get_overlap_policy()`.
+    """
+
+    def __init__(
+            self,
+            components: List[ScheduleRunnable],
+            process_workers: Optional[int] = None,
+            thread_workers: Optional[int] = None,
+            channel: Optional[NewRowChannel] = None,
+    ):
+        """
+        :param components: The scheduled components that will be dispatched on this pool
+        :param process_workers: Number of worker processes, defaults to the number of runs the process components may
+            have at the same time, so that a slow component never delays the others
+        :param thread_workers: Number of worker threads, defaults to the number of runs the thread components may have
+            at the same time
+        :param channel: The channel on which the worker processes notify the new rows they write
+        """
+        self._components: Dict[str, ScheduleRunnable] = {
+            component.get_configuration().name: component for component in components
+        }
+        self._states: Dict[str, _RunState] = {
+            name: _RunState(component) for name, component in self._components.items()
+        }
+        self._lock = threading.Lock()
+
+        process_components = [c for c in components if c.get_execution_mode() == "process"]
+        thread_components = [c for c in components if c.get_execution_mode() == "thread"]
+
+        def max_runs(components: List[ScheduleRunnable]) -> int:
+            # Components are mostly I/O-bound, so the workers are not bounded by the number of CPUs
+            return sum(self._states[c.get_configuration().name].limit for c in components)
+
+        self._process_executor = None
+        if process_components:
+            self._process_executor = ProcessPoolExecutor(
+                max_workers=process_workers or max_runs(process_components),
+                initializer=_initialize_worker,
+                initargs=(process_components, channel),
+            )
+
+        self._thread_executor = None
+        if thread_components:
+            self._thread_executor = ThreadPoolExecutor(
+                max_workers=thread_workers or max_runs(thread_components),
+                thread_name_prefix="component",
+            )
+
+    def submit(self, name: str, queue_if_busy: bool = False) -> Optional[Future]:
+        """
+        Submit a run of the component with the given name, following its overlap policy.
+
+        :param name: The name of the component, as defined in its configuration
+        :param queue_if_busy: Queue the run instead of skipping it when the component is busy, whatever its policy.
+            Used for runs triggered by new data, which must not be lost.
+        :return: A future resolving to the result of the run, or None if the run was skipped. A queued run gets a
+            future too, resolved once it is over. When a run is queued already, the run is merged into it and its
+            future is returned.
+        """
+        state = self._states[name]
+
+        with self._lock:
+            if state.running >= state.limit:
+                state.statistics.overrun += 1
+                queue = state.policy == "queue" or queue_if_busy
+                if queue and state.pending is None:
+                    state.pending = Future()
+                    state.statistics.queued += 1
+                    logger.debug(f"{name} is still running, queued the next run")
+                else:
+                    state.statistics.skipped += 1
+                    logger.debug(f"{name} is still running, skipped the run")
+                return state.pending if queue else None
+
+            state.running += 1
+            state.statistics.started += 1
+
+        return self._start(name)
+
+    def _start(self, name: str) -> Future:
+        component = self._components[name]
+
+        try:
+            if component.get_execution_mode() == "thread":
+                future = self._thread_executor.submit(component.run)
+            else:
+                future = self._process_executor.submit(_run_in_worker, name)
+        except Exception:
+            with self._lock:
+                self._states[name].running -= 1
+            raise
+
+        future.add_done_callback(lambda f: self._on_done(name, f))
+        return future
+
+    def _on_done(self, name: str, future: Future):
+        state = self._states[name]
+
+        failed = not future.cancelled() and future.exception() is not None
+        if failed:
+            exception = future.exception()
+            logger.error(f"Run of {name} failed: {exception!r}", exc_info=exception)
+
+        with self._lock:
+            if failed:
+                state.statistics.failed += 1
+            elif not future.cancelled():
+                state.statistics.completed += 1
+
+            # Hand the slot over to the queued run, if any
+            pending = state.pending
+            state.pending = None
+            start_pending = pending is not None and not future.cancelled()
+            if start_pending:
+                state.statistics.started += 1
+            else:
+                state.running -= 1
+
+        if pending is not None and not start_pending:
+            pending.cancel()
+        elif start_pending:
+            try:
+                self._start(name).add_done_callback(lambda f: _transfer(f, pending))
+            except Exception as e:
+                logger.exception(f"Failed to start queued run of {name}: {e}")
+                pending.set_exception(e)
+
+    def get_statistics(self) -> Dict[str, dict]:
+        """
+        Return the run counters of every component.
+
+        :return: A dictionary mapping component names to their `RunStatistics` as a dictionary
+        """
+        with self._lock:
+            return {name: asdict(state.statistics) for name, state in self._states.items()}
+
+    def shutdown(self, wait: bool = True):
+        for executor in (self._process_executor, self._thread_executor):
+            if executor is not None:
+                executor.shutdown(wait=wait, cancel_futures=True)
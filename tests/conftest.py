@@ -0,0 +1,18 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# The package reads its configuration when it is imported, the tests run on a SQLite file and a local directory
+_directory = tempfile.mkdtemp(prefix="digitaltwin_dataspace_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+os.environ["FILE_STORAGE_DIRECTORY"] = os.path.join(_directory, "storage")
+for variable in ("AZURE_STORAGE_CONNECTION_STRING", "BLOB_DISK_CACHE_DIRECTORY", "GROUP_COMMIT_DELAY"):
+    os.environ.pop(variable, None)
+
+
+@pytest.fixture
+def name() -> str:
+    """Name of a component unique to the test, so that tests sharing the database do not see each other's rows."""
+    return f"test_{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from digitaltwin_dataspace.components.harvester import Harvester, HarvesterConfiguration
+from digitaltwin_dataspace.data.engine import engine
+from digitaltwin_dataspace.data.retrieve import Data
+from digitaltwin_dataspace.data.sync_db import get_or_create_standard_component_table
+from digitaltwin_dataspace.data.write import write_results
+
+START = datetime(2024, 1, 1)
+
+
+def at(minutes: int, seconds: int = 0) -> datetime:
+    return START + timedelta(minutes=minutes, seconds=seconds)
+
+
+class RecordingHarvester(Harvester):
+    """Harvester of 10 minute windows of its source, writing the dates of the source rows of each window."""
+
+    def __init__(self, name: str, source: str, max_windows: int):
+        self.configuration = HarvesterConfiguration(
+            name=name,
+            description="",
+            content_type="application/json",
+            source=source,
+            source_range="10m",
+            catch_up_max_windows=max_windows,
+        )
+        self.windows = []
+
+    def get_configuration(self) -> HarvesterConfiguration:
+        return self.configuration
+
+    def get_schedule(self) -> str:
+        return "1m"
+
+    def harvest(self, source_data, **dependencies_data):
+        dates = [row.date for row in source_data]
+        self.windows.append(dates)
+        return [date.isoformat() for date in dates]
+
+
+def harvested(name: str) -> list:
+    """Date and content of the rows of a harvester, None for the rows recording an empty window."""
+    table = get_or_create_standard_component_table(name)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(table.c.date, table.c.data, table.c.hash).order_by(table.c.date)
+        ).fetchall()
+    return [
+        (row.date, None if row.data is None else json.loads(Data(row.date, row.hash, row.data).data))
+        for row in rows
+    ]
+
+
+@pytest.fixture
+def source(name):
+    source = f"{name}_source"
+    table = get_or_create_standard_component_table(source)
+
+    def write(*dates):
+        write_results(source, "application/json", table, [({"date": date.isoformat()}, date) for date in dates])
+
+    # Windows start one second before the first source row, i.e. at 00:00. Nothing is collected between 00:10 and 00:20
+    write(at(0, 1), at(5), at(21), at(35))
+    return source, write
+
+
+def test_catch_up_harvests_the_closed_windows_and_records_the_gaps(name, source):
+    source, write = source
+    harvester = RecordingHarvester(name, source, max_windows=10)
+
+    assert harvester.run() is True
+
+    # The window of the latest source row is still open
+    assert harvested(name) == [
+        (at(10), [at(0, 1).isoformat(), at(5).isoformat()]),
+        (at(20), None),
+        (at(30), [at(21).isoformat()]),
+    ]
+    assert harvester.windows == [[at(0, 1), at(5)], [at(21)]]
+
+    assert harvester.run() is False
+    assert len(harvested(name)) == 3
+
+    # A source row after the open window closes it
+    write(at(41))
+    assert harvester.run() is True
+    assert harvested(name)[3:] == [(at(40), [at(35).isoformat()])]
+
+
+def test_catch_up_stops_after_the_maximum_number_of_windows(name, source):
+    source, _ = source
+    harvester = RecordingHarvester(name, source, max_windows=2)
+
+    assert harvester.run() is True
+    assert [date for date, _ in harvested(name)] == [at(10), at(20)]
+
+    assert harvester.run() is True
+    assert [date for date, _ in harvested(name)] == [at(10), at(20), at(30)]
+    assert harvester.windows == [[at(0, 1), at(5)], [at(21)]]
+
+
+def test_catch_up_matches_one_window_per_run(name, source):
+    source, _ = source
+    caught_up = RecordingHarvester(f"{name}_caught_up", source, max_windows=10)
+    caught_up.run()
+
+    one_by_one = RecordingHarvester(name, source, max_windows=1)
+    while one_by_one.run():
+        pass
+
+    assert harvested(name) == harvested(f"{name}_caught_up")
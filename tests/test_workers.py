@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+from digitaltwin_dataspace.components.base import Component, ComponentConfiguration, ScheduleRunnable
+from digitaltwin_dataspace.workers import WorkerPool
+
+
+class BlockingComponent(Component, ScheduleRunnable):
+    """Component running on the thread pool, whose runs wait until they are released."""
+
+    def __init__(self, name: str, policy: str = "skip", max_concurrent_runs: int = 1, fail: bool = False):
+        self.name = name
+        self.policy = policy
+        self.max_concurrent_runs = max_concurrent_runs
+        self.fail = fail
+        self.release = threading.Event()
+        self.runs = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def get_configuration(self) -> ComponentConfiguration:
+        return ComponentConfiguration(name=self.name, description="", content_type="application/json")
+
+    def get_schedule(self) -> str:
+        return "1m"
+
+    def get_execution_mode(self):
+        return "thread"
+
+    def get_overlap_policy(self):
+        return self.policy
+
+    def get_max_concurrent_runs(self) -> int:
+        return self.max_concurrent_runs
+
+    def run(self):
+        with self._lock:
+            self.runs += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if not self.release.wait(5):
+                raise TimeoutError("The run was never released")
+            if self.fail:
+                raise RuntimeError("Run failed")
+            return self.runs
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition not met")
+        time.sleep(0.01)
+
+
+def settled_statistics(pool: WorkerPool, name: str) -> dict:
+    # Futures wake their waiters before running the callbacks updating the counters
+    wait_for(lambda: (lambda s: s["completed"] + s["failed"] == s["started"])(pool.get_statistics()[name]))
+    return pool.get_statistics()[name]
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(*components):
+        pool = WorkerPool(list(components))
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_skip_drops_overrun_ticks(make_pool, name):
+    component = BlockingComponent(name)
+    pool = make_pool(component)
+
+    future = pool.submit(name)
+    assert future is not None
+    assert pool.submit(name) is None
+    assert pool.submit(name) is None
+
+    component.release.set()
+    future.result(timeout=5)
+
+    assert component.runs == 1
+    assert settled_statistics(pool, name) == {
+        "started": 1, "completed": 1, "failed": 0, "overrun": 2, "queued": 0, "skipped": 2,
+    }
+    # The component is free again once its run is over
+    assert pool.submit(name).result(timeout=5) == 2
+
+
+def test_queue_runs_one_pending_run_after_the_current_one(make_pool, name):
+    component = BlockingComponent(name, policy="queue")
+    pool = make_pool(component)
+
+    first = pool.submit(name)
+    wait_for(lambda: component.running == 1)
+    queued = pool.submit(name)
+    # A run queued already absorbs the next ones
+    assert pool.submit(name) is queued
+    assert not queued.done()
+
+    component.release.set()
+    first.result(timeout=5)
+    queued.result(timeout=5)
+
+    assert component.runs == 2
+    assert component.max_running == 1
+    assert settled_statistics(pool, name) == {
+        "started": 2, "completed": 2, "failed": 0, "overrun": 2, "queued": 1, "skipped": 1,
+    }
+
+
+def test_queue_if_busy_queues_whatever_the_policy(make_pool, name):
+    component = BlockingComponent(name)
+    pool = make_pool(component)
+
+    first = pool.submit(name)
+    queued = pool.submit(name, queue_if_busy=True)
+    assert queued is not None
+
+    component.release.set()
+    first.result(timeout=5)
+    queued.result(timeout=5)
+
+    assert component.runs == 2
+    statistics = settled_statistics(pool, name)
+    assert (statistics["queued"], statistics["skipped"]) == (1, 0)
+
+
+def test_concurrent_allows_up_to_the_maximum_number_of_runs(make_pool, name):
+    component = BlockingComponent(name, policy="concurrent", max_concurrent_runs=2)
+    pool = make_pool(component)
+
+    futures = [pool.submit(name), pool.submit(name)]
+    assert all(future is not None for future in futures)
+    wait_for(lambda: component.running == 2)
+    assert pool.submit(name) is None
+
+    component.release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert component.max_running == 2
+    assert settled_statistics(pool, name) == {
+        "started": 2, "completed": 2, "failed": 0, "overrun": 1, "queued": 0, "skipped": 1,
+    }
+
+
+def test_failed_runs_are_counted_and_free_the_component(make_pool, name):
+    component = BlockingComponent(name, fail=True)
+    component.release.set()
+    pool = make_pool(component)
+
+    with pytest.raises(RuntimeError):
+        pool.submit(name).result(timeout=5)
+
+    statistics = settled_statistics(pool, name)
+    assert (statistics["started"], statistics["completed"], statistics["failed"]) == (1, 0, 1)
+    with pytest.raises(RuntimeError):
+        pool.submit(name).result(timeout=5)
+
+
+def test_pools_default_to_the_runs_the_components_may_have_at_once(make_pool, name):
+    pool = make_pool(
+        BlockingComponent(f"{name}_a"),
+        BlockingComponent(f"{name}_b", policy="queue"),
+        BlockingComponent(f"{name}_c", policy="concurrent", max_concurrent_runs=3),
+    )
+
+    assert pool._thread_executor._max_workers == 5
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from digitaltwin_dataspace.data.engine import engine
+from digitaltwin_dataspace.data.retrieve import retrieve_latest_row
+from digitaltwin_dataspace.data.sync_db import get_or_create_standard_component_table
+from digitaltwin_dataspace.data.write import write_result, write_results
+
+START = datetime(2024, 1, 1)
+
+
+def rows(table) -> list:
+    with engine.connect() as connection:
+        return connection.execute(
+            select(table.c.id, table.c.date, table.c.data, table.c.hash, table.c.copy_id).order_by(table.c.date)
+        ).fetchall()
+
+
+def stored_files(name: str) -> list:
+    directory = os.path.join(os.environ["FILE_STORAGE_DIRECTORY"], name)
+    return os.listdir(directory) if os.path.isdir(directory) else []
+
+
+def at(seconds: int) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def test_rows_of_a_batch_point_to_the_first_row_of_their_hash(name):
+    table = get_or_create_standard_component_table(name)
+
+    write_results(name, "application/json", table, [("a", at(0)), ("b", at(1)), ("a", at(2)), (None, at(3))])
+
+    a, b, copy, empty = rows(table)
+    assert (a.copy_id, b.copy_id) == (None, None)
+    assert a.data is not None and b.data is not None
+    assert (copy.copy_id, copy.data, copy.hash) == (a.id, None, None)
+    # Rows without data only record their date
+    assert (empty.data, empty.hash, empty.copy_id) == (None, None, None)
+    assert len(stored_files(name)) == 2
+
+
+def test_rows_point_to_the_rows_of_previous_batches(name):
+    table = get_or_create_standard_component_table(name)
+
+    write_results(name, "application/json", table, [("a", at(0)), ("b", at(1))])
+    write_results(name, "application/json", table, [("b", at(2)), ("c", at(3)), ("c", at(4))])
+    write_result(name, "application/json", table, "a", at(5))
+
+    a, b, copy_b, c, copy_c, copy_a = rows(table)
+    assert copy_b.copy_id == b.id
+    assert c.copy_id is None and c.data is not None
+    assert copy_c.copy_id == c.id
+    assert copy_a.copy_id == a.id
+    assert len(stored_files(name)) == 3
+
+    # Copies read the data of the row they point to
+    assert retrieve_latest_row(table).data == b"a"
+
+
+def test_copies_point_to_the_latest_row_holding_the_data(name):
+    table = get_or_create_standard_component_table(name)
+
+    write_result(name, "application/json", table, "a", at(0))
+    write_result(name, "application/json", table, "a", at(1), deduplicate=False)
+    write_results(name, "application/json", table, [("a", at(2))])
+
+    first, second, copy = rows(table)
+    assert second.copy_id is None and second.data is not None and second.data != first.data
+    assert copy.copy_id == second.id
+
+
+def test_deduplication_can_be_disabled(name):
+    table = get_or_create_standard_component_table(name)
+
+    write_results(name, "application/json", table, [("a", at(0)), ("a", at(1))], deduplicate=False)
+
+    assert [row.copy_id for row in rows(table)] == [None, None]
+    assert len(stored_files(name)) == 2